@@ -0,0 +1,191 @@
+import argparse
+import json
+import os
+import platform
+import re
+import resource
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from src.benchmarks.synthetic_pdf import METRICS, SENTENCES, write_synthetic_pdf
+from src.core.instrumentation import get_instrumentation
+from src.core.pdf_extractor import PDFExtractor
+from src.core.processors.text_processor import TextProcessor
+
+TINY_MODEL_NAME = "local/tiny-random-bert-qa"
+QUESTIONS = [
+    "what is company name?",
+    "what is Scope 1 CO2e emissions?",
+    "how many net sales in 2021?",
+    "how many number of employee ",
+    "what dividend does the board propose?",
+    "Net sales, SEK thousands in 2021?",
+]
+
+
+def register_tiny_model(vocab_dir: str) -> str:
+    """Build a randomly initialized two-layer BERT QA model and register it as a shared model.
+
+    The vocabulary is made from the synthetic report text, so nothing is downloaded.
+    Answers are meaningless; this only exercises the code paths and measures overheads.
+    """
+    from transformers import BertConfig, BertForQuestionAnswering, BertTokenizerFast
+
+    from src.core.qa_model import register_shared_model
+
+    words = set()
+    for text in SENTENCES + [metric for metric, _, _ in METRICS] + QUESTIONS:
+        words.update(re.findall(r"[a-z]+|\d", text.lower()))
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + sorted(words) + [str(d) for d in range(10)]
+    vocab_path = os.path.join(vocab_dir, "vocab.txt")
+    with open(vocab_path, "w") as f:
+        f.write("\n".join(dict.fromkeys(vocab)))
+
+    tokenizer = BertTokenizerFast(vocab_file=vocab_path, do_lower_case=True)
+    config = BertConfig(vocab_size=tokenizer.vocab_size, hidden_size=64, num_hidden_layers=2,
+                        num_attention_heads=2, intermediate_size=128, max_position_embeddings=512)
+    model = BertForQuestionAnswering(config).eval()
+    register_shared_model(TINY_MODEL_NAME, tokenizer, model)
+    return TINY_MODEL_NAME
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    return {
+        "p50": ordered[int(0.50 * (len(ordered) - 1))],
+        "p95": ordered[int(0.95 * (len(ordered) - 1))],
+        "mean": statistics.mean(ordered)
+    }
+
+
+def _time_stage(func: Callable[[], Any], repeats: int, trace_memory: bool) -> Dict[str, Any]:
+    """Run func repeats times and report wall time percentiles and optionally Python peak memory"""
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+
+    result = {"seconds": _percentiles(durations)}
+    if trace_memory:
+        tracemalloc.start()
+        func()
+        result["peak_python_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def _with_pdf(pdf_path: str, enable_ocr: bool, method: str) -> Callable[[], Any]:
+    def run():
+        extractor = PDFExtractor(enable_ocr=enable_ocr)
+        extractor.load_pdf(pdf_path)
+        try:
+            return getattr(extractor, method)()
+        finally:
+            extractor.close()
+    return run
+
+
+def benchmark_document(pdf_path: str, pages: int, args, model_name: str) -> Dict[str, Any]:
+    stages = {}
+    for method in ("extract_content", "extract_tables", "extract_images", "extract_all"):
+        stages[method] = _time_stage(_with_pdf(pdf_path, args.enable_ocr, method), args.repeats, args.trace_memory)
+        stages[method]["pages_per_second"] = pages / stages[method]["seconds"]["p50"]
+
+    text_processor = TextProcessor()
+    text = _with_pdf(pdf_path, args.enable_ocr, "extract_content")()
+    stages["split_into_chunks"] = _time_stage(
+        lambda: text_processor.split_into_chunks(text), args.repeats, args.trace_memory
+    )
+
+    if not args.skip_qa:
+        from src.services.qa_service import QAService
+
+        qa_service = QAService(enable_ocr=args.enable_ocr, model_name=model_name, memoize=False)
+        stages["split_into_token_windows"] = _time_stage(
+            lambda: text_processor.split_into_token_windows(text, qa_service.qa_model.tokenizer),
+            args.repeats, args.trace_memory
+        )
+        qa_service.load_document_state(qa_service.extract_document(pdf_path))
+        qa_service.build_retrieval_indexes()
+        qa_service.get_answers(QUESTIONS[:1])  # Warm-up
+
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            for question in QUESTIONS:
+                question_start = time.perf_counter()
+                qa_service.get_answers([question])
+                latencies.append(time.perf_counter() - question_start)
+        total = time.perf_counter() - start
+        stages["get_answers"] = {
+            "seconds_per_question": _percentiles(latencies),
+            "questions_per_second": len(latencies) / total
+        }
+
+        start = time.perf_counter()
+        qa_service.get_answers(QUESTIONS)
+        stages["get_answers_batched"] = {"questions_per_second": len(QUESTIONS) / (time.perf_counter() - start)}
+
+        # Page streaming with extraction and inference in turn, then overlapped
+        for pipelined in (False, True):
+            stages["stream_answers_pipelined" if pipelined else "stream_answers"] = _time_stage(
+                lambda: list(qa_service.stream_answers(pdf_path, QUESTIONS, stop_early=False, pipelined=pipelined)),
+                args.repeats, args.trace_memory
+            )
+
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extraction and QA throughput on synthetic PDFs")
+    parser.add_argument("--pages", nargs="+", type=int, default=[10, 50])
+    parser.add_argument("--table-density", type=float, default=0.5, help="Tables per page")
+    parser.add_argument("--image-density", type=float, default=0.3, help="Images per page")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--enable-ocr", action="store_true")
+    parser.add_argument("--trace-memory", action="store_true", help="Also record tracemalloc peaks per stage")
+    parser.add_argument("--skip-qa", action="store_true")
+    parser.add_argument("--model-name", default=None, help="QA model; defaults to a tiny offline test model")
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        model_name = args.model_name
+        if not args.skip_qa and not model_name:
+            model_name = register_tiny_model(work_dir)
+
+        documents = []
+        for pages in args.pages:
+            pdf_path = os.path.join(work_dir, f"synthetic_{pages}.pdf")
+            write_synthetic_pdf(pdf_path, pages, args.table_density, args.image_density)
+            stages = benchmark_document(pdf_path, pages, args, model_name)
+            documents.append({"pages": pages, "file_bytes": os.path.getsize(pdf_path), "stages": stages})
+            print(f"{pages:>5} pages: extract_all {stages['extract_all']['pages_per_second']:.1f} pages/s"
+                  + (f", {stages['get_answers']['questions_per_second']:.2f} questions/s"
+                     if "get_answers" in stages else ""))
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "settings": vars(args),
+        "model_name": model_name,
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                          * (1 if platform.system() == "Darwin" else 1024),
+        "documents": documents,
+        # Totals across every run above, from the pipeline's own stage timers and counters
+        "instrumentation": get_instrumentation().snapshot()
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import argparse
+import json
+import re
+import statistics
+import string
+import time
+from typing import Any, Dict, List
+
+from src.core.qa_model import BACKENDS, DEFAULT_MODEL_NAME, QAModel
+
+# Fixed (context, question, expected answer) set modelled on annual and sustainability report text
+QUESTION_SET = [
+    ("Absolent Air Care Group AB is a Swedish group offering filtration products for industrial air.",
+     "What is the company name?", "Absolent Air Care Group AB"),
+    ("Net sales for 2021 amounted to SEK 1,081 million compared to SEK 899 million in 2020.",
+     "How much were net sales in 2021?", "SEK 1,081 million"),
+    ("At the end of the year the group had 512 employees in 14 countries.",
+     "How many employees does the group have?", "512"),
+    ("Scope 1 CO2e emissions decreased to 310 tonnes during the year, mainly from the vehicle fleet.",
+     "What were Scope 1 CO2e emissions?", "310 tonnes"),
+    ("The group sells its products under four brands: Absolent, Filtermist, Dust Control and Kerstar.",
+     "How many brands does the group have?", "four"),
+    ("The operating margin (EBITA) was 17.4 percent in 2021, up from 15.2 percent in 2020.",
+     "What was the operating margin in 2021?", "17.4 percent"),
+    ("The head office is located in Lidköping, Sweden, where the group was founded in 1993.",
+     "Where is the head office located?", "Lidköping, Sweden"),
+    ("The board proposes a dividend of SEK 1.70 per share for the 2021 financial year.",
+     "What dividend does the board propose?", "SEK 1.70 per share"),
+]
+
+
+def normalize_answer(text: str) -> str:
+    """SQuAD-style normalization: lowercase, drop punctuation, articles and extra whitespace"""
+    text = text.lower()
+    text = "".join(ch for ch in text if ch not in set(string.punctuation))
+    text = re.sub(r"\b(a|an|the)\b", " ", text)
+    return " ".join(text.split())
+
+
+def benchmark_backend(backend: str, model_name: str, repeats: int = 3) -> Dict[str, Any]:
+    """Load a backend and measure latency and exact match over QUESTION_SET"""
+    start = time.perf_counter()
+    model = QAModel(model_name=model_name, backend=backend)
+    model.load_model()
+    load_seconds = time.perf_counter() - start
+
+    # Warm up so one-off graph and allocator setup is not counted
+    model.get_answer(QUESTION_SET[0][1], QUESTION_SET[0][0])
+
+    latencies_ms = []
+    exact_matches = 0
+    for _ in range(repeats):
+        for context, question, expected in QUESTION_SET:
+            start = time.perf_counter()
+            result = model.get_answer(question, context)
+            latencies_ms.append((time.perf_counter() - start) * 1000)
+            exact_matches += normalize_answer(result["answer"]) == normalize_answer(expected)
+
+    ordered = sorted(latencies_ms)
+    return {
+        "backend": backend,
+        "device": model.device,
+        "load_seconds": load_seconds,
+        "mean_ms": statistics.mean(latencies_ms),
+        "p50_ms": ordered[int(0.50 * (len(ordered) - 1))],
+        "p95_ms": ordered[int(0.95 * (len(ordered) - 1))],
+        "exact_match": exact_matches / len(latencies_ms)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare QA inference backends")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--model-name", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results: List[Dict[str, Any]] = []
+    for backend in args.backends:
+        try:
+            results.append(benchmark_backend(backend, args.model_name, args.repeats))
+        except Exception as e:
+            results.append({"backend": backend, "error": str(e)})
+
+    for result in results:
+        if "error" in result:
+            print(f"{result['backend']:<12} error: {result['error']}")
+        else:
+            print(f"{result['backend']:<12} device={result['device']:<5} load={result['load_seconds']:.1f}s "
+                  f"mean={result['mean_ms']:.1f}ms p95={result['p95_ms']:.1f}ms EM={result['exact_match']:.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
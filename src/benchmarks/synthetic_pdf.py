@@ -0,0 +1,154 @@
+import io
+import random
+import zlib
+from typing import List, Optional, Tuple
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+
+METRICS = [
+    ("Net sales, SEK thousands", 800_000, 1_200_000),
+    ("Operating profit, SEK thousands", 50_000, 200_000),
+    ("Number of employees", 200, 900),
+    ("Scope 1 CO2e emissions, tonnes", 100, 900),
+    ("Energy use, MWh", 1_000, 9_000),
+]
+SECTIONS = ["Administration report", "Sustainability report", "Financial statements", "Notes"]
+SENTENCES = [
+    "{company} develops filtration products for industrial air in {count} countries.",
+    "Net sales for {year} amounted to SEK {sales} thousand compared to the previous year.",
+    "The group had {employees} employees at the end of {year} across all subsidiaries.",
+    "Scope 1 CO2e emissions were {emissions} tonnes in {year}, mainly from the vehicle fleet.",
+    "The board proposes a dividend of SEK {dividend} per share for the financial year.",
+    "Sustainability work focuses on energy efficiency, safety and responsible sourcing.",
+]
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _text_line(x: float, y: float, text: str, size: int = 10) -> str:
+    return f"BT /F1 {size} Tf {x:.1f} {y:.1f} Td ({_escape(text)}) Tj ET\n"
+
+
+def _table_ops(top: float, rows: List[List[str]], col_widths: List[float], row_height: float = 16) -> str:
+    """Ruled table: cell borders as line segments (so the 'lines' strategy finds it) plus cell text"""
+    ops = []
+    left = 50.0
+    width = sum(col_widths)
+    for r in range(len(rows) + 1):
+        y = top - r * row_height
+        ops.append(f"{left:.1f} {y:.1f} m {left + width:.1f} {y:.1f} l S\n")
+    x = left
+    for w in col_widths + [0]:
+        ops.append(f"{x:.1f} {top:.1f} m {x:.1f} {top - len(rows) * row_height:.1f} l S\n")
+        x += w
+    for r, row in enumerate(rows):
+        x = left
+        for cell, w in zip(row, col_widths):
+            ops.append(_text_line(x + 3, top - (r + 1) * row_height + 4, cell, 9))
+            x += w
+    return "".join(ops)
+
+
+def _make_image(text: str, seed: int) -> Tuple[bytes, int, int]:
+    """JPEG with some text drawn on it, embedded with DCTDecode so OCR can read it"""
+    from PIL import Image, ImageDraw
+
+    image = Image.new("L", (400, 120), color=255)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([4, 4, 395, 115], outline=seed % 120)
+    draw.text((20, 45), text, fill=0)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue(), image.width, image.height
+
+
+def write_synthetic_pdf(path: str, pages: int = 10, tables_per_page: float = 0.5, images_per_page: float = 0.3,
+                        seed: Optional[int] = 0, company: str = "Example Air Group AB") -> None:
+    """Write a report-like PDF with text, ruled KPI tables and text images.
+
+    tables_per_page and images_per_page are densities: 0.5 puts a table on every other page.
+    Only the standard library and Pillow (for the images) are needed.
+    """
+    rng = random.Random(seed)
+    objects: List[bytes] = []
+
+    def add(obj: bytes) -> int:
+        objects.append(obj)
+        return len(objects)
+
+    catalog_id = add(b"")  # filled in once the page tree exists
+    pages_id = add(b"")
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids = []
+    table_budget = 0.0
+    image_budget = 0.0
+    years = [2021, 2020]
+    for page_number in range(1, pages + 1):
+        ops = [_text_line(50, PAGE_HEIGHT - 30, f"{company} - Annual and sustainability report, page {page_number}", 8)]
+        y = PAGE_HEIGHT - 60
+        # Each report section starts on a new page with a large heading
+        section = SECTIONS[(page_number - 1) * len(SECTIONS) // pages]
+        if page_number == 1 or section != SECTIONS[(page_number - 2) * len(SECTIONS) // pages]:
+            ops.append(_text_line(50, y, section, 18))
+            y -= 30
+        for _ in range(12):
+            sentence = rng.choice(SENTENCES).format(
+                company=company, count=rng.randint(5, 30), year=rng.choice(years),
+                sales=f"{rng.randint(800_000, 1_200_000):,}".replace(",", " "),
+                employees=rng.randint(200, 900), emissions=rng.randint(100, 900),
+                dividend=f"{rng.uniform(0.5, 3.0):.2f}"
+            )
+            ops.append(_text_line(50, y, sentence))
+            y -= 14
+
+        xobjects = {}
+        table_budget += tables_per_page
+        if table_budget >= 1:
+            table_budget -= 1
+            rows = [["Key figures"] + [str(year) for year in years]]
+            for metric, low, high in METRICS:
+                rows.append([metric] + [f"{rng.randint(low, high):,}".replace(",", " ") for _ in years])
+            ops.append(_table_ops(y - 10, rows, [220, 90, 90]))
+            y -= 10 + 16 * len(rows) + 20
+
+        image_budget += images_per_page
+        if image_budget >= 1:
+            image_budget -= 1
+            data, width, height = _make_image(f"Scope 1 CO2e emissions {rng.randint(100, 900)} tonnes", page_number)
+            image_id = add(
+                f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceGray "
+                f"/BitsPerComponent 8 /Filter /DCTDecode /Length {len(data)} >>\nstream\n".encode()
+                + data + b"\nendstream"
+            )
+            xobjects[f"Im{len(xobjects) + 1}"] = image_id
+            ops.append(f"q 200 0 0 60 50 {max(y - 70, 40):.1f} cm /Im{len(xobjects)} Do Q\n")
+
+        content = zlib.compress("".join(ops).encode("latin-1", errors="replace"))
+        content_id = add(f"<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n".encode() + content + b"\nendstream")
+        xobject_entries = " ".join(f"/{name} {obj_id} 0 R" for name, obj_id in xobjects.items())
+        page_ids.append(add(
+            f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> /XObject << {xobject_entries} >> >> "
+            f"/Contents {content_id} 0 R >>".encode()
+        ))
+
+    objects[catalog_id - 1] = f"<< /Type /Catalog /Pages {pages_id} 0 R >>".encode()
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[pages_id - 1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, obj in enumerate(objects, 1):
+            offsets.append(f.tell())
+            f.write(f"{number} 0 obj\n".encode() + obj + b"\nendobj\n")
+        xref_offset = f.tell()
+        f.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+        for offset in offsets:
+            f.write(f"{offset:010d} 00000 n \n".encode())
+        f.write(f"trailer\n<< /Size {len(objects) + 1} /Root {catalog_id} 0 R >>\n"
+                f"startxref\n{xref_offset}\n%%EOF\n".encode())
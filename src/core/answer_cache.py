@@ -0,0 +1,102 @@
+import hashlib
+import json
+import logging
+import os
+import re
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class AnswerCache:
+    """Memoizes answers by (document hash, normalized question, model config).
+
+    Keeps a bounded in-memory LRU tier and an optional on-disk tier of JSON files.
+    """
+
+    PUNCTUATION_PATTERN = re.compile(r"[^\w\s]")
+
+    def __init__(self, max_entries: int = 1024, cache_dir: Optional[str] = None):
+        self.logger = logging.getLogger(__name__)
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.config_fingerprint = ""
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def normalize_question(self, question: str) -> str:
+        """Lowercase, drop punctuation and collapse whitespace"""
+        return " ".join(self.PUNCTUATION_PATTERN.sub(" ", question.lower()).split())
+
+    def set_config(self, config: Dict[str, Any]) -> None:
+        """Switch config; it is part of every key, so answers memoized under other configs
+        are kept and simply stop matching until the config is switched back
+        """
+        self.config_fingerprint = hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+    def make_key(self, document_hash: str, question: str) -> str:
+        raw = f"{self.config_fingerprint}:{document_hash}:{self.normalize_question(question)}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, document_hash: str, question: str) -> Optional[Dict[str, Any]]:
+        key = self.make_key(document_hash, question)
+        answer = self.entries.get(key)
+        if answer is not None:
+            self.entries.move_to_end(key)
+            self.memory_hits += 1
+            return dict(answer)
+
+        answer = self._read_disk(key)
+        if answer is not None:
+            self.disk_hits += 1
+            self._remember(key, answer)
+            return dict(answer)
+
+        self.misses += 1
+        return None
+
+    def put(self, document_hash: str, question: str, answer: Dict[str, Any]) -> None:
+        key = self.make_key(document_hash, question)
+        self._remember(key, answer)
+        self._write_disk(key, answer)
+
+    def _remember(self, key: str, answer: Dict[str, Any]) -> None:
+        self.entries[key] = dict(answer)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.cache_dir:
+            return None
+        path = os.path.join(self.cache_dir, key + ".json")
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.warning(f"Error reading memoized answer {key}: {str(e)}")
+            return None
+
+    def _write_disk(self, key: str, answer: Dict[str, Any]) -> None:
+        if not self.cache_dir:
+            return
+        path = os.path.join(self.cache_dir, key + ".json")
+        try:
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(answer, f)
+            os.replace(path + ".tmp", path)
+        except Exception as e:
+            self.logger.error(f"Error writing memoized answer {key}: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self.entries),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses
+        }
@@ -0,0 +1,84 @@
+import logging
+import sys
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+def value_bytes(value: Any) -> int:
+    """Approximate size of a cached value: tensor storage, or a deep size for Python containers"""
+    if hasattr(value, "nelement") and hasattr(value, "element_size"):
+        return value.nelement() * value.element_size()
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(value_bytes(k) + value_bytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(value_bytes(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class ContextEncodingCache:
+    """Per-document LRU cache of context-side model inputs and representations, bounded in bytes.
+
+    Entries are keyed by a window's "key" (its source and position in the document), which
+    QAService assigns when a document is loaded. Windows without a key are built on every call.
+    """
+
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024):
+        self.logger = logging.getLogger(__name__)
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[Tuple[str, Hashable], Any]" = OrderedDict()  # (kind, window key) -> value
+        self.sizes: Dict[Tuple[str, Hashable], int] = {}
+        self.memory_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, kind: str, key: Hashable, build: Callable[[], Any]) -> Any:
+        """Cached value of kind for key, built and stored on a miss"""
+        entry_key = (kind, key)
+        if entry_key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(entry_key)
+            return self.entries[entry_key]
+
+        self.misses += 1
+        value = build()
+        size = value_bytes(value)
+        if size <= self.max_bytes:
+            self.entries[entry_key] = value
+            self.sizes[entry_key] = size
+            self.memory_bytes += size
+            self._evict()
+        return value
+
+    def _evict(self) -> None:
+        while self.memory_bytes > self.max_bytes and self.entries:
+            entry_key, _ = self.entries.popitem(last=False)
+            self.memory_bytes -= self.sizes.pop(entry_key)
+            self.evictions += 1
+
+    def _window_value(self, kind: str, window: Dict[str, Any], build: Callable[[Dict[str, Any]], Any]) -> Any:
+        key = window.get("key")
+        if key is None:
+            self.misses += 1
+            return build(window)
+        return self.get(kind, key, lambda: build(window))
+
+    def context_tensor(self, window: Dict[str, Any], build: Callable[[Dict[str, Any]], Any]) -> Any:
+        """Token id tensor of a window, built once"""
+        return self._window_value("tensor", window, build)
+
+    def context_embeddings(self, window: Dict[str, Any], build: Callable[[Dict[str, Any]], Any]) -> Any:
+        """Normalized token embeddings of a window for late-interaction scoring, built once"""
+        return self._window_value("embeddings", window, build)
+
+    def has_embeddings(self, window: Dict[str, Any]) -> bool:
+        return ("embeddings", window.get("key")) in self.entries
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.sizes.clear()
+        self.memory_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self.entries), "memory_bytes": self.memory_bytes, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
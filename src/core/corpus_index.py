@@ -0,0 +1,268 @@
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+class CorpusIndex:
+    """Append-only, memory-mapped vector index over the chunks of many documents.
+
+    Files in index_dir:
+      vectors.f32      float32 embeddings, one row per chunk
+      meta.i64         int64 rows of (document, page, start, text offset, text length)
+      texts.bin        UTF-8 chunk texts, addressed by the meta rows
+      documents.jsonl  document ids, one per line, in ingestion order
+      centroids.npy    IVF coarse centroids, once trained
+      assignments.i32  IVF list of each chunk
+      index.json       committed sizes; anything past them is an unfinished write and is truncated
+
+    Search is exact until the index is trained, then IVF: the query is compared with
+    the centroids and only the vectors of the nprobe nearest lists are scored.
+    """
+
+    META_COLUMNS = 5
+
+    def __init__(self, index_dir: str, dim: Optional[int] = None, nlist: int = 256, nprobe: int = 8,
+                 train_threshold: Optional[int] = None):
+        self.logger = logging.getLogger(__name__)
+        self.index_dir = index_dir
+        self.nprobe = nprobe
+        os.makedirs(index_dir, exist_ok=True)
+
+        self.manifest = {"dim": dim, "count": 0, "text_bytes": 0, "documents": 0, "nlist": nlist, "trained": False}
+        if os.path.exists(self._path("index.json")):
+            with open(self._path("index.json"), "r", encoding="utf-8") as f:
+                self.manifest.update(json.load(f))
+        if dim and self.manifest["dim"] and dim != self.manifest["dim"]:
+            raise ValueError(f"Index at {index_dir} has dimension {self.manifest['dim']}, not {dim}")
+        # Train the IVF lists once there are enough vectors for every list to be useful
+        self.train_threshold = train_threshold or self.manifest["nlist"] * 39
+
+        self._truncate_uncommitted()
+        self.document_ids = self._read_documents()
+        self._document_set = set(self.document_ids)
+        self._vectors: Optional[np.ndarray] = None
+        self._meta: Optional[np.ndarray] = None
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: Optional[List[np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return self.manifest["count"]
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self.manifest["dim"]
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def _truncate_uncommitted(self) -> None:
+        """Drop bytes written after the last committed manifest (an add interrupted by a crash)"""
+        dim = self.manifest["dim"] or 0
+        sizes = {
+            "vectors.f32": self.manifest["count"] * dim * 4,
+            "meta.i64": self.manifest["count"] * self.META_COLUMNS * 8,
+            "texts.bin": self.manifest["text_bytes"],
+            "assignments.i32": self.manifest["count"] * 4 if self.manifest["trained"] else 0
+        }
+        for name, size in sizes.items():
+            path = self._path(name)
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                self.logger.warning(f"Truncating uncommitted data in {path}")
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+
+    def _read_documents(self) -> List[str]:
+        if not os.path.exists(self._path("documents.jsonl")):
+            return []
+        with open(self._path("documents.jsonl"), "r", encoding="utf-8") as f:
+            documents = [json.loads(line) for line in f if line.strip()]
+        if len(documents) > self.manifest["documents"]:
+            documents = documents[:self.manifest["documents"]]
+            with open(self._path("documents.jsonl"), "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(document_id) + "\n" for document_id in documents)
+        return documents
+
+    def _commit(self) -> None:
+        tmp_path = self._path("index.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path("index.json"))
+
+    def vectors(self) -> np.ndarray:
+        """Memory-mapped (count, dim) view of all committed vectors"""
+        if self._vectors is None:
+            if not len(self):
+                return np.zeros((0, self.dim or 0), dtype=np.float32)
+            self._vectors = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r",
+                                      shape=(len(self), self.dim))
+        return self._vectors
+
+    def meta(self) -> np.ndarray:
+        if self._meta is None:
+            if not len(self):
+                return np.zeros((0, self.META_COLUMNS), dtype=np.int64)
+            self._meta = np.memmap(self._path("meta.i64"), dtype=np.int64, mode="r",
+                                   shape=(len(self), self.META_COLUMNS))
+        return self._meta
+
+    def has_document(self, document_id: str) -> bool:
+        return document_id in self._document_set
+
+    def add(self, document_id: str, chunks: List[Dict[str, Any]], embeddings: np.ndarray) -> None:
+        """Append a document's chunks ({"text", "page", "start"}) and their embeddings.
+
+        Embeddings are L2-normalized here, so search scores are cosine similarities.
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if len(chunks) != len(embeddings):
+            raise ValueError(f"{len(chunks)} chunks but {len(embeddings)} embeddings")
+        if self.has_document(document_id):
+            raise ValueError(f"Document {document_id} is already indexed")
+        if not len(chunks):
+            return
+        if self.dim is None:
+            self.manifest["dim"] = int(embeddings.shape[1])
+        elif embeddings.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional embeddings, got {embeddings.shape[1]}")
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.maximum(norms, 1e-12)
+
+        document_index = len(self.document_ids)
+        texts = [chunk["text"].encode("utf-8") for chunk in chunks]
+        meta = np.zeros((len(chunks), self.META_COLUMNS), dtype=np.int64)
+        text_offset = self.manifest["text_bytes"]
+        for row, (chunk, text) in enumerate(zip(chunks, texts)):
+            meta[row] = (document_index, chunk.get("page") or 0, chunk.get("start") or 0, text_offset, len(text))
+            text_offset += len(text)
+
+        self._append("vectors.f32", embeddings.tobytes())
+        self._append("meta.i64", meta.tobytes())
+        self._append("texts.bin", b"".join(texts))
+        self._append("documents.jsonl", (json.dumps(document_id) + "\n").encode("utf-8"))
+        if self.manifest["trained"]:
+            assignments = self._assign(embeddings)
+            self._append("assignments.i32", assignments.astype(np.int32).tobytes())
+
+        self.manifest["count"] += len(chunks)
+        self.manifest["text_bytes"] = text_offset
+        self.manifest["documents"] += 1
+        self._commit()
+
+        self.document_ids.append(document_id)
+        self._document_set.add(document_id)
+        self._vectors = self._meta = None
+        self._lists = None
+
+        if not self.manifest["trained"] and len(self) >= self.train_threshold:
+            self.train()
+
+    def _append(self, name: str, data: bytes) -> None:
+        with open(self._path(name), "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def train(self, sample_size: int = 100000, iterations: int = 10, seed: int = 0) -> None:
+        """Fit IVF centroids with spherical k-means on a sample and assign every vector to a list"""
+        vectors = self.vectors()
+        nlist = min(self.manifest["nlist"], len(vectors))
+        if not nlist:
+            return
+        rng = np.random.default_rng(seed)
+        sample_ids = rng.choice(len(vectors), size=min(sample_size, len(vectors)), replace=False)
+        sample = np.asarray(vectors[np.sort(sample_ids)])
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for list_id in range(nlist):
+                members = sample[labels == list_id]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[list_id] = centroid / max(np.linalg.norm(centroid), 1e-12)
+
+        np.save(self._path("centroids.npy"), centroids)
+        self._centroids = centroids
+        assignments = np.concatenate([
+            self._assign(np.asarray(vectors[start:start + 65536])) for start in range(0, len(vectors), 65536)
+        ]).astype(np.int32)
+        with open(self._path("assignments.i32"), "wb") as f:
+            f.write(assignments.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self.manifest["nlist"] = nlist
+        self.manifest["trained"] = True
+        self._commit()
+        self._lists = None
+        self.logger.info(f"Trained {nlist} IVF lists over {len(vectors)} vectors")
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self.centroids().T, axis=1)
+
+    def centroids(self) -> np.ndarray:
+        if self._centroids is None:
+            self._centroids = np.load(self._path("centroids.npy"))
+        return self._centroids
+
+    def inverted_lists(self) -> List[np.ndarray]:
+        """Vector ids of every IVF list, rebuilt from the assignments file after adds"""
+        if self._lists is None:
+            assignments = np.fromfile(self._path("assignments.i32"), dtype=np.int32, count=len(self))
+            order = np.argsort(assignments, kind="stable")
+            bounds = np.searchsorted(assignments[order], np.arange(self.manifest["nlist"] + 1))
+            self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(self.manifest["nlist"])]
+        return self._lists
+
+    def search(self, query: np.ndarray, top_k: int = 20, nprobe: Optional[int] = None,
+               max_per_document: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Nearest chunks to a query embedding, best first"""
+        if not len(self):
+            return []
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        query = query / max(np.linalg.norm(query), 1e-12)
+        vectors = self.vectors()
+
+        if self.manifest["trained"]:
+            probe = min(nprobe or self.nprobe, self.manifest["nlist"])
+            nearest_lists = np.argsort(-(self.centroids() @ query))[:probe]
+            lists = self.inverted_lists()
+            candidates = np.sort(np.concatenate([lists[list_id] for list_id in nearest_lists]))
+            scores = np.asarray(vectors[candidates]) @ query
+        else:
+            candidates = np.arange(len(self))
+            scores = np.asarray(vectors) @ query
+
+        if max_per_document is None and len(scores) > top_k:
+            # Only the top_k scores need ordering
+            top = np.argpartition(-scores, top_k)[:top_k]
+            order = top[np.argsort(-scores[top])]
+        else:
+            order = np.argsort(-scores)
+        meta = self.meta()
+        hits = []
+        per_document: Dict[int, int] = {}
+        with open(self._path("texts.bin"), "rb") as texts:
+            for position in order:
+                chunk_id = int(candidates[position])
+                document_index, page, start, text_offset, text_length = (int(value) for value in meta[chunk_id])
+                if max_per_document and per_document.get(document_index, 0) >= max_per_document:
+                    continue
+                per_document[document_index] = per_document.get(document_index, 0) + 1
+                texts.seek(text_offset)
+                hits.append({
+                    "chunk_id": chunk_id,
+                    "document_id": self.document_ids[document_index],
+                    "page": page or None,
+                    "start": start,
+                    "text": texts.read(text_length).decode("utf-8"),
+                    "score": float(scores[position])
+                })
+                if len(hits) >= top_k:
+                    break
+        return hits
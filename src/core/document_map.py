@@ -0,0 +1,196 @@
+import bisect
+import logging
+import re
+from collections import Counter
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from src.core.retrieval_index import BM25Index
+
+
+@dataclass
+class Heading:
+    text: str
+    page: int
+    size: float
+    bold: bool
+
+
+@dataclass
+class Section:
+    title: str
+    kind: Optional[str]
+    level: int
+    start_page: int
+    end_page: int
+    start: int  # Character offsets in the document text
+    end: int
+
+
+class DocumentMap:
+    """Pages, headings and section spans of a document, for routing questions to the right part"""
+
+    # Heading keywords -> section kind, checked in order
+    SECTION_KINDS = [
+        ("sustainability", ("sustainability", "esg", "environment", "climate", "emissions", "social responsibility")),
+        ("financial_statements", ("income statement", "balance sheet", "cash flow", "financial statements",
+                                  "changes in equity", "financial position", "comprehensive income")),
+        ("notes", ("notes", "accounting principles", "accounting policies")),
+        ("key_figures", ("key figures", "five-year", "multi-year", "financial highlights", "in brief")),
+        ("governance", ("corporate governance", "board of directors", "auditor", "remuneration")),
+        ("administration_report", ("administration report", "directors' report", "directors report")),
+    ]
+    # Question words that point at a section kind even when the heading shares no words with the question
+    KIND_HINTS = {
+        "sustainability": ("co2e", "co2", "emission", "scope", "energy", "waste", "water", "diversity", "injury"),
+        "financial_statements": ("asset", "liabilitie", "equity", "cash", "revenue", "profit", "ebit", "tax"),
+        "key_figures": ("net sales", "margin", "employee", "dividend", "return on"),
+        "governance": ("board", "ceo", "auditor", "chairman"),
+    }
+
+    def __init__(self, heading_ratio: float = 1.2, max_heading_chars: int = 80):
+        self.logger = logging.getLogger(__name__)
+        self.heading_ratio = heading_ratio  # Lines this much larger than body text are headings
+        self.max_heading_chars = max_heading_chars
+        self.page_offsets: List[int] = []  # Character offset where each page starts, by page index
+        self.headings: List[Heading] = []
+        self.sections: List[Section] = []
+        self.body_size = 0.0
+        self._index: Optional[BM25Index] = None
+
+    @staticmethod
+    def page_lines(page) -> List[Dict[str, Any]]:
+        """Text lines of a pdfplumber page with their largest font size and boldness"""
+        lines: List[Dict[str, Any]] = []
+        chars = sorted(page.chars, key=lambda char: (round(char["top"]), char["x0"]))
+        current: List[Dict[str, Any]] = []
+        for char in chars + [None]:
+            if char is not None and (not current or abs(char["top"] - current[-1]["top"]) < 2):
+                current.append(char)
+                continue
+            if current:
+                text = "".join(c["text"] for c in current).strip()
+                if text:
+                    lines.append({
+                        "text": " ".join(text.split()),
+                        "size": round(max(c["size"] for c in current), 1),
+                        "bold": all("bold" in c.get("fontname", "").lower() for c in current if c["text"].strip()),
+                        "chars": len(current)
+                    })
+            current = [char] if char is not None else []
+        return lines
+
+    def heading_candidates(self, page) -> Dict[str, Any]:
+        """Per-page input for build: candidate heading lines plus the page's font size histogram"""
+        lines = self.page_lines(page)
+        sizes = Counter()
+        for line in lines:
+            sizes[line["size"]] += line["chars"]
+        candidates = [
+            {"text": line["text"], "size": line["size"], "bold": line["bold"]}
+            for line in lines
+            if len(line["text"]) <= self.max_heading_chars and re.search(r"[A-Za-z]{3}", line["text"])
+        ]
+        return {"headings": candidates, "font_sizes": {str(size): count for size, count in sizes.items()}}
+
+    def build(self, pages: List[Dict[str, Any]], page_texts: List[str],
+              clean: Optional[Callable[[str], str]] = None) -> None:
+        """Build the map from per-page heading candidates and the cleaned text of each page.
+
+        The document text is the page texts joined with a single space, so page and
+        section offsets point straight into it. clean is the cleaner applied to the page
+        texts, used to find the headings in them.
+        """
+        offset = 0
+        self.page_offsets = []
+        for text in page_texts:
+            self.page_offsets.append(offset)
+            offset += len(text) + 1
+        document_length = max(offset - 1, 0)
+
+        sizes = Counter()
+        for page in pages:
+            for size, count in page.get("font_sizes", {}).items():
+                sizes[float(size)] += count
+        self.body_size = sizes.most_common(1)[0][0] if sizes else 0.0
+
+        self.headings = []
+        starts = []
+        for index, page in enumerate(pages):
+            for candidate in page.get("headings", []):
+                larger = self.body_size and candidate["size"] >= self.body_size * self.heading_ratio
+                bold_line = candidate["bold"] and candidate["size"] >= self.body_size
+                if not (larger or bold_line):
+                    continue
+                heading = Heading(candidate["text"], page["page_number"], candidate["size"], candidate["bold"])
+                needle = (clean(heading.text) if clean else heading.text).strip()
+                position = page_texts[index].find(needle) if index < len(page_texts) and needle else -1
+                self.headings.append(heading)
+                starts.append(self.page_offsets[index] + max(position, 0) if index < len(self.page_offsets) else 0)
+
+        # Bigger headings are higher levels; a section runs until the next heading of the same or a higher level
+        levels = {size: level for level, size in enumerate(sorted({h.size for h in self.headings}, reverse=True), 1)}
+        self.sections = []
+        for i, heading in enumerate(self.headings):
+            level = levels[heading.size]
+            end = document_length
+            for j in range(i + 1, len(self.headings)):
+                if levels[self.headings[j].size] <= level:
+                    end = starts[j]
+                    break
+            self.sections.append(Section(heading.text, self.classify(heading.text), level, heading.page,
+                                         self.page_at(max(end - 1, starts[i])), starts[i], end))
+
+        self.logger.debug(f"Document map: {len(self.page_offsets)} pages, {len(self.sections)} sections, "
+                          f"body font size {self.body_size}")
+
+    def classify(self, title: str) -> Optional[str]:
+        lowered = title.lower()
+        for kind, keywords in self.SECTION_KINDS:
+            if any(keyword in lowered for keyword in keywords):
+                return kind
+        return None
+
+    def page_at(self, offset: int) -> int:
+        """1-based page number holding a document character offset"""
+        if not self.page_offsets:
+            return 0
+        return max(bisect.bisect_right(self.page_offsets, offset), 1)
+
+    def section_at(self, offset: int) -> Optional[Section]:
+        """Innermost section containing a document character offset"""
+        containing = [section for section in self.sections if section.start <= offset < section.end]
+        return max(containing, key=lambda section: section.level) if containing else None
+
+    def build_index(self, text: str) -> None:
+        """Index section titles (weighted) and bodies so questions can be routed to sections"""
+        self._index = BM25Index()
+        documents = []
+        for section in self.sections:
+            hints = " ".join(self.KIND_HINTS.get(section.kind, ()))
+            documents.append(f"{section.title} {section.title} {section.title} {hints} "
+                             f"{text[section.start:section.end]}")
+        self._index.build(documents)
+
+    def route(self, question: str, top_n: int = 3) -> List[Section]:
+        """The top_n sections most likely to answer a question, or [] when the map cannot tell"""
+        if not self.sections or self._index is None:
+            return []
+        return [self.sections[section_id] for section_id, _ in self._index.search(question, top_n)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "page_offsets": self.page_offsets,
+            "body_size": self.body_size,
+            "headings": [asdict(heading) for heading in self.headings],
+            "sections": [asdict(section) for section in self.sections]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DocumentMap":
+        document_map = cls()
+        document_map.page_offsets = data.get("page_offsets", [])
+        document_map.body_size = data.get("body_size", 0.0)
+        document_map.headings = [Heading(**heading) for heading in data.get("headings", [])]
+        document_map.sections = [Section(**section) for section in data.get("sections", [])]
+        return document_map
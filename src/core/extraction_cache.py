@@ -0,0 +1,100 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+
+class ExtractionCache:
+    """Content-addressed on-disk cache of extraction results with LRU eviction"""
+
+    SUFFIX = ".json.gz"
+
+    def __init__(self, cache_dir: str, max_size_bytes: int = 512 * 1024 * 1024):
+        self.logger = logging.getLogger(__name__)
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def file_hash(path: str, block_size: int = 1024 * 1024) -> str:
+        """SHA-256 of the file contents"""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def make_key(self, pdf_path: str, settings: Dict[str, Any], file_hash: Optional[str] = None) -> str:
+        """Cache key from the file hash plus extractor settings (including its version)"""
+        settings_blob = json.dumps(settings, sort_keys=True)
+        file_hash = file_hash or self.file_hash(pdf_path)
+        return hashlib.sha256(f"{file_hash}:{settings_blob}".encode()).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + self.SUFFIX)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached payload or None, marking the entry as recently used"""
+        path = self._entry_path(key)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                payload = json.load(f)
+            os.utime(path)  # Touch for LRU ordering
+            return payload
+        except Exception as e:
+            self.logger.warning(f"Dropping unreadable cache entry {key}: {str(e)}")
+            self._remove(path)
+            return None
+
+    def put(self, key: str, payload: Dict[str, Any]) -> None:
+        """Store a payload and evict least recently used entries over the size budget"""
+        path = self._entry_path(key)
+        tmp_path = path + ".tmp"
+        try:
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump(payload, f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except Exception as e:
+            self.logger.error(f"Error writing cache entry {key}: {str(e)}")
+            self._remove(tmp_path)
+            return
+
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache fits max_size_bytes"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(self.SUFFIX):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size_bytes:
+                break
+            self._remove(path)
+            total -= size
+            self.logger.debug(f"Evicted cache entry {path}")
+
+    def clear(self) -> None:
+        """Remove every cache entry"""
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(self.SUFFIX):
+                self._remove(os.path.join(self.cache_dir, name))
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
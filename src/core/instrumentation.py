@@ -0,0 +1,301 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+PROFILE_MODES = ("cprofile", "tracemalloc")
+
+
+class StageStats:
+    """Call count, total/max duration and a bounded window of recent durations for one stage"""
+
+    def __init__(self, window: int = 1024):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def summary(self, include_recent: bool = False) -> Dict[str, Any]:
+        ordered = sorted(self.recent)
+        summary = {
+            "count": self.count,
+            "total_seconds": self.total,
+            "max_seconds": self.max,
+            "p50_seconds": ordered[int(0.50 * (len(ordered) - 1))] if ordered else 0.0,
+            "p95_seconds": ordered[int(0.95 * (len(ordered) - 1))] if ordered else 0.0
+        }
+        if include_recent:
+            summary["recent"] = list(self.recent)
+        return summary
+
+    def merge(self, summary: Dict[str, Any], suffix: str = "_seconds") -> None:
+        self.count += summary["count"]
+        self.total += summary["total" + suffix]
+        self.max = max(self.max, summary["max" + suffix])
+        self.recent.extend(summary.get("recent", ()))
+
+
+class Instrumentation:
+    """Thread-safe stage timers, counters and value distributions with pluggable sinks.
+
+    Timers measure stages (page parse, table extract, OCR, forward passes), counters
+    count events (pages, OCR cache hits) and observations record distributions such
+    as batch sizes and chunk counts. Disabled instrumentation makes every hook a no-op.
+    """
+
+    def __init__(self, sinks: Optional[List[Any]] = None, enabled: bool = True):
+        self.logger = logging.getLogger(__name__)
+        self.sinks = sinks or []
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._cprofile_lock = threading.Lock()
+        self._tracemalloc_lock = threading.Lock()
+        self._tracemalloc_captures = 0  # Running tracemalloc captures
+        self._tracemalloc_owned = False  # Whether a capture started tracing
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stages: Dict[str, StageStats] = defaultdict(StageStats)
+            self.counters: Dict[str, float] = defaultdict(float)
+            self.observations: Dict[str, StageStats] = defaultdict(StageStats)
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """Time a block of code as one call of stage"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_time(stage, time.perf_counter() - start)
+
+    def record_time(self, stage: str, seconds: float) -> None:
+        if self.enabled:
+            with self._lock:
+                self.stages[stage].add(seconds)
+
+    def increment(self, counter: str, value: float = 1) -> None:
+        if self.enabled:
+            with self._lock:
+                self.counters[counter] += value
+
+    def observe(self, name: str, value: float) -> None:
+        """Record a value such as a batch size; reported with the same summary as stage times"""
+        if self.enabled:
+            with self._lock:
+                self.observations[name].add(value)
+
+    def snapshot(self, include_recent: bool = False) -> Dict[str, Any]:
+        """Summaries of every stage, counter and observation.
+
+        include_recent adds the raw recent values so another process can merge exact percentiles.
+        """
+        with self._lock:
+            return {
+                "stages": {stage: stats.summary(include_recent) for stage, stats in self.stages.items()},
+                "counters": dict(self.counters),
+                "observations": {
+                    name: {key.replace("_seconds", ""): value
+                           for key, value in stats.summary(include_recent).items()}
+                    for name, stats in self.observations.items()
+                }
+            }
+
+    def merge(self, snapshot: Dict[str, Any]) -> None:
+        """Fold a snapshot from another process (e.g. an extraction worker) into these totals"""
+        if not self.enabled:
+            return
+        with self._lock:
+            for stage, summary in snapshot.get("stages", {}).items():
+                self.stages[stage].merge(summary)
+            for counter, value in snapshot.get("counters", {}).items():
+                self.counters[counter] += value
+            for name, summary in snapshot.get("observations", {}).items():
+                self.observations[name].merge(summary, suffix="")
+
+    def emit(self) -> None:
+        """Send the current snapshot to every sink"""
+        snapshot = self.snapshot()
+        for sink in self.sinks:
+            try:
+                sink.emit(snapshot)
+            except Exception as e:
+                self.logger.error(f"Error emitting metrics to {type(sink).__name__}: {str(e)}")
+
+    @contextmanager
+    def capture(self, mode: Optional[str], top: int = 25) -> Iterator[Dict[str, Any]]:
+        """Profile a block of code with cProfile or tracemalloc.
+
+        Yields a dict that holds the report once the block exits. A mode of None
+        profiles nothing, so callers can pass a per-request option straight through.
+        cProfile only sees the calling thread, so the block should do its work there, and
+        only one cProfile capture can run at a time. tracemalloc captures may overlap:
+        tracing stops when the last one ends, and peak_bytes is only reported by a capture
+        that started tracing itself, since the peak cannot be reset per capture.
+        """
+        report: Dict[str, Any] = {}
+        if mode is None:
+            yield report
+            return
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode}, expected one of {PROFILE_MODES}")
+
+        if mode == "cprofile":
+            if not self._cprofile_lock.acquire(blocking=False):
+                raise RuntimeError("Another cProfile capture is already running")
+            try:
+                profiler = cProfile.Profile()
+                profiler.enable()
+                try:
+                    yield report
+                finally:
+                    profiler.disable()
+                    output = io.StringIO()
+                    pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(top)
+                    report.update({"mode": mode, "report": output.getvalue()})
+            finally:
+                self._cprofile_lock.release()
+            return
+
+        with self._tracemalloc_lock:
+            started = not tracemalloc.is_tracing()
+            if started:
+                tracemalloc.start()
+                self._tracemalloc_owned = True
+            self._tracemalloc_captures += 1
+        try:
+            before = tracemalloc.take_snapshot()
+            try:
+                yield report
+            finally:
+                current, peak = tracemalloc.get_traced_memory()
+                differences = tracemalloc.take_snapshot().compare_to(before, "lineno")[:top]
+                report.update({
+                    "mode": mode,
+                    "current_bytes": current,
+                    "peak_bytes": peak if started else None,
+                    "report": "\n".join(str(difference) for difference in differences)
+                })
+        finally:
+            with self._tracemalloc_lock:
+                self._tracemalloc_captures -= 1
+                # Tracing started outside any capture is left running
+                if not self._tracemalloc_captures and self._tracemalloc_owned:
+                    tracemalloc.stop()
+                    self._tracemalloc_owned = False
+
+
+class LogSink:
+    """Logs one line per stage, counter and observation"""
+
+    def __init__(self, level: int = logging.INFO):
+        self.logger = logging.getLogger(__name__)
+        self.level = level
+
+    def emit(self, snapshot: Dict[str, Any]) -> None:
+        for stage, summary in sorted(snapshot["stages"].items()):
+            self.logger.log(self.level, f"stage {stage}: {summary['count']} calls, "
+                                        f"{summary['total_seconds']:.3f}s total, "
+                                        f"p50 {summary['p50_seconds'] * 1000:.1f}ms, "
+                                        f"p95 {summary['p95_seconds'] * 1000:.1f}ms")
+        for counter, value in sorted(snapshot["counters"].items()):
+            self.logger.log(self.level, f"counter {counter}: {value:g}")
+        for name, summary in sorted(snapshot["observations"].items()):
+            self.logger.log(self.level, f"observed {name}: {summary['count']} values, "
+                                        f"mean {summary['total'] / max(summary['count'], 1):.1f}, "
+                                        f"max {summary['max']:g}")
+
+
+class JSONSink:
+    """Appends each snapshot as a JSON line to a file"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def emit(self, snapshot: Dict[str, Any]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"timestamp": time.time(), **snapshot}) + "\n")
+
+
+class PrometheusSink:
+    """Renders snapshots in the Prometheus text exposition format.
+
+    With a path the text is written atomically for the node exporter textfile
+    collector; the latest rendering is also kept in self.text for /metrics handlers.
+    """
+
+    def __init__(self, path: Optional[str] = None, prefix: str = "pdfqa"):
+        self.path = path
+        self.prefix = prefix
+        self.text = ""
+
+    def emit(self, snapshot: Dict[str, Any]) -> None:
+        self.text = self.render(snapshot)
+        if self.path:
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(self.text)
+            os.replace(self.path + ".tmp", self.path)
+
+    def render(self, snapshot: Dict[str, Any]) -> str:
+        prefix = self.prefix
+        lines = [
+            f"# HELP {prefix}_stage_seconds Time spent per pipeline stage",
+            f"# TYPE {prefix}_stage_seconds summary"
+        ]
+        for stage, summary in sorted(snapshot["stages"].items()):
+            label = f'stage="{_label(stage)}"'
+            lines.append(f'{prefix}_stage_seconds{{{label},quantile="0.5"}} {summary["p50_seconds"]}')
+            lines.append(f'{prefix}_stage_seconds{{{label},quantile="0.95"}} {summary["p95_seconds"]}')
+            lines.append(f"{prefix}_stage_seconds_sum{{{label}}} {summary['total_seconds']}")
+            lines.append(f"{prefix}_stage_seconds_count{{{label}}} {summary['count']}")
+        for counter, value in sorted(snapshot["counters"].items()):
+            name = f"{prefix}_{_metric_name(counter)}_total"
+            lines.extend([f"# TYPE {name} counter", f"{name} {value:g}"])
+        for observation, summary in sorted(snapshot["observations"].items()):
+            name = f"{prefix}_{_metric_name(observation)}"
+            lines.append(f"# TYPE {name} summary")
+            lines.append(f'{name}{{quantile="0.5"}} {summary["p50"]}')
+            lines.append(f'{name}{{quantile="0.95"}} {summary["p95"]}')
+            lines.append(f"{name}_sum {summary['total']}")
+            lines.append(f"{name}_count {summary['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _metric_name(name: str) -> str:
+    return "".join(char if char.isalnum() else "_" for char in name.lower())
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+# Process-wide instrumentation used by the extractor, processors, model and services
+_instrumentation = Instrumentation()
+
+
+def get_instrumentation() -> Instrumentation:
+    return _instrumentation
+
+
+def configure_instrumentation(sinks: Optional[List[Any]] = None, enabled: bool = True) -> Instrumentation:
+    """Set the sinks and on/off switch of the process-wide instrumentation"""
+    _instrumentation.sinks = sinks or []
+    _instrumentation.enabled = enabled
+    return _instrumentation
@@ -1,26 +1,86 @@
-from typing import Dict, Any
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
 import pdfplumber
 import logging
-import re
+import os
+import tempfile
+import threading
 
+from src.core.document_map import DocumentMap
+from src.core.instrumentation import get_instrumentation
 from src.core.processors.image_processor import ImageProcessor
 from src.core.processors.table_processor import TableProcessor
+from src.core.processors.text_normalizer import TextNormalizer
+
+
+# A worker process's extractor and the document it is extracting, kept across that document's
+# page ranges so an image already OCR'd in an earlier range of the worker is skipped
+_worker_extractor: Optional[Tuple[str, "PDFExtractor"]] = None
+
+
+def _extract_page_range(pdf_path: str, enable_ocr: bool, ocr_options: Dict[str, Any],
+                        start: int, end: int) -> Dict[str, Any]:
+    """Worker entry point: open the PDF once and extract pages [start, end) in a single pass.
+
+    Returns the pages plus the worker's instrumentation snapshot for the parent to merge.
+    """
+    global _worker_extractor
+    # Forked workers inherit the parent's totals, and pool workers are reused across tasks
+    get_instrumentation().reset()
+    # Each extract_parallel call has its own pool, so its workers only ever see one document
+    if _worker_extractor is None or _worker_extractor[0] != pdf_path:
+        _worker_extractor = (pdf_path, PDFExtractor(enable_ocr=enable_ocr, ocr_options=ocr_options))
+    extractor = _worker_extractor[1]
+    extractor.load_pdf(pdf_path, reset_images=False)
+    try:
+        pages = list(extractor.visit_pages(extractor.pdf.pages[start:end], resolve_images=False))
+        # Futures cannot cross the process boundary, so resolve OCR before returning
+        pages = [extractor.resolve_images(page) for page in pages]
+        return {"pages": pages, "metrics": get_instrumentation().snapshot(include_recent=True)}
+    finally:
+        extractor.close()
 
 
 class PDFExtractor:
     """Handles extraction of content from PDF"""
 
-    def __init__(self, enable_ocr: bool = False):
+    # Bump whenever extraction output changes so cached results are invalidated
+    VERSION = "5"
+
+    def __init__(self, enable_ocr: bool = False, ocr_options: Optional[Dict[str, Any]] = None):
         self.logger = logging.getLogger(__name__)
         self.pdf = None
+        self.pdf_path = None
         self.enable_ocr = enable_ocr
+        self.ocr_options = ocr_options or {}  # Extra ImageProcessor arguments (workers, size limits, cache dir)
         self.table_processor = TableProcessor()
-        self.image_processor = ImageProcessor()
+        self.image_processor = ImageProcessor(enable_ocr=enable_ocr, **self.ocr_options)
+        self.table_rows = []  # Structured rows from the last extract_tables call
+        self.document_map = DocumentMap()  # Finds heading candidates on each page
+        self.normalizer = TextNormalizer()
+
+    def settings(self) -> Dict[str, Any]:
+        """Settings that affect extraction output, used for cache keys"""
+        image_processor = self.image_processor
+        return {
+            "version": self.VERSION,
+            "enable_ocr": self.enable_ocr,
+            "ocr_min_pixels": image_processor.min_pixels,
+            "ocr_min_display_points": image_processor.min_display_points,
+            "ocr_max_side": image_processor.max_side,
+            "ocr_binarize_threshold": image_processor.binarize_threshold,
+            "ocr_lang": image_processor.lang,
+            **self.table_processor.settings(),
+            "normalizer": self.normalizer.settings()
+        }
 
-    def load_pdf(self, pdf_path: str) -> None:
-        """Loads PDF file"""
+    def load_pdf(self, pdf_path: str, reset_images: bool = True) -> None:
+        """Loads PDF file; reset_images=False keeps skipping images seen in earlier loads"""
         try:
             self.pdf = pdfplumber.open(pdf_path)
+            self.pdf_path = pdf_path
+            if reset_images:
+                self.image_processor.reset()
         except Exception as e:
             raise Exception(f"Error loading PDF: {str(e)}")
 
@@ -31,24 +91,172 @@ class PDFExtractor:
 
         try:
             content = ""
+            instrumentation = get_instrumentation()
             for page in self.pdf.pages:
                 # Extract text from page
-                text = page.extract_text()
+                with instrumentation.timer("page_parse"):
+                    text = page.extract_text()
+                instrumentation.increment("pages")
                 if text:
                     content += text + "\n\n"
 
-            # Basic cleaning while preserving important content
-            content = re.sub(r'\s+', ' ', content)  # Normalize whitespace
-            content = content.replace('|', ' ')  # Remove vertical bars
-            content = content.strip()  # Remove leading/trailing whitespace
-
             # self.logger.debug(f"Extracted content length: {len(content)}")
-            return content
+            return self.normalize_content(content)
 
         except Exception as e:
             self.logger.error(f"Error extracting content: {str(e)}")
             return ""
 
+    def normalize_content(self, content: str) -> str:
+        """Basic cleaning while preserving important content"""
+        return self.normalizer.clean(content)
+
+    def extract_page(self, page, resolve_images: bool = True) -> Dict[str, Any]:
+        """Extract text, table rows and image text from a single page.
+
+        With resolve_images=False OCR keeps running in the background and the page
+        holds "image_futures" until resolve_images is called on it.
+        """
+        result = self.parse_page(page)
+        result["table_rows"] = self.table_processor.extract_table_data([page])
+        return self.resolve_images(result) if resolve_images else result
+
+    def parse_page(self, page) -> Dict[str, Any]:
+        """Text, heading candidates and submitted OCR work of a page; tables are extracted separately"""
+        instrumentation = get_instrumentation()
+        with instrumentation.timer("page_parse"):
+            text = page.extract_text() or ""
+        instrumentation.increment("pages")
+        with instrumentation.timer("heading_detect"):
+            layout = self.document_map.heading_candidates(page)
+        return {
+            "page_number": page.page_number,
+            "text": text,
+            "image_futures": self.image_processor.submit_page(page),
+            **layout
+        }
+
+    def pipeline_stages(self) -> List[Tuple[str, Callable[[Any], Any]]]:
+        """Page parse, table detection and OCR as Pipeline stages over pdfplumber pages.
+
+        pdfplumber objects of one document are not safe to use from two threads at once,
+        so the parse and table stages take turns on a lock. OCR waits on the image
+        processor's workers outside it, while later pages are parsed.
+        """
+        lock = threading.Lock()
+
+        def parse(page) -> Dict[str, Any]:
+            with lock:
+                return {**self.parse_page(page), "pdf_page": page}
+
+        def detect_tables(result: Dict[str, Any]) -> Dict[str, Any]:
+            page = result.pop("pdf_page")
+            with lock:
+                try:
+                    result["table_rows"] = self.table_processor.extract_table_data([page])
+                finally:
+                    self.release_page(page)
+            return result
+
+        return [("page_parse", parse), ("table_detect", detect_tables), ("ocr", self.resolve_images)]
+
+    def resolve_images(self, page: Dict[str, Any]) -> Dict[str, Any]:
+        """Wait for a page's OCR results"""
+        if "image_futures" in page:
+            with get_instrumentation().timer("ocr_wait"):
+                page["image_texts"] = self.image_processor.collect(page.pop("image_futures"))
+        return page
+
+    def visit_pages(self, pages, resolve_images: bool = True) -> Iterator[Dict[str, Any]]:
+        """Load each page once, run all processors on it and release its parsed objects"""
+        for page in pages:
+            try:
+                yield self.extract_page(page, resolve_images)
+            finally:
+                self.release_page(page)
+
+    def release_page(self, page) -> None:
+        """Drop pdfplumber's cached layout objects so memory stays flat across pages"""
+        try:
+            if hasattr(page, "close"):
+                page.close()
+            else:
+                page.flush_cache()
+        except Exception as e:
+            self.logger.debug(f"Error releasing page: {str(e)}")
+
+    def extract_all(self) -> Dict[str, Any]:
+        """Extract text, tables and images in a single pass over the pages"""
+        if not self.pdf:
+            raise Exception("PDF not loaded")
+
+        # OCR of earlier pages overlaps with parsing of later ones
+        return self.merge_pages(list(self.visit_pages(self.pdf.pages, resolve_images=False)))
+
+    def extract_parallel(self, workers: Optional[int] = None, pages_per_task: int = 8) -> Dict[str, Any]:
+        """Extract all pages with a process pool, each worker handling a contiguous page range.
+
+        The OCR thread budget is split between the workers, and workers share an OCR disk
+        cache (a temporary one unless ocr_cache_dir is set), so an image repeated across page
+        ranges is mostly OCR'd once.
+        """
+        if not self.pdf:
+            raise Exception("PDF not loaded")
+
+        page_count = len(self.pdf.pages)
+        workers = workers or os.cpu_count() or 1
+        ranges = [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+        self.logger.debug(f"Extracting {page_count} pages in {len(ranges)} tasks on {workers} workers")
+
+        ocr_options = {**self.ocr_options,
+                       "max_workers": max(1, self.image_processor.max_workers // min(workers, len(ranges) or 1))}
+        temporary_cache = None
+        if self.enable_ocr and not ocr_options.get("ocr_cache_dir"):
+            temporary_cache = tempfile.TemporaryDirectory(prefix="ocr-cache-")
+            ocr_options["ocr_cache_dir"] = temporary_cache.name
+
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # map preserves submission order, so pages come back in document order
+                range_results = executor.map(
+                    _extract_page_range,
+                    [self.pdf_path] * len(ranges),
+                    [self.enable_ocr] * len(ranges),
+                    [ocr_options] * len(ranges),
+                    [start for start, _ in ranges],
+                    [end for _, end in ranges]
+                )
+                pages = []
+                for range_result in range_results:
+                    pages.extend(range_result["pages"])
+                    get_instrumentation().merge(range_result["metrics"])
+        finally:
+            if temporary_cache:
+                temporary_cache.cleanup()
+
+        return self.merge_pages(pages)
+
+    def merge_pages(self, pages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Combine per-page results in page order into document level content"""
+        pages = [self.resolve_images(page) for page in pages]
+        self.table_rows = [row for page in pages for row in page["table_rows"]]
+        with get_instrumentation().timer("normalize_text"):
+            # One pass per page; the offset map leads from text_content back to each page's raw text
+            normalized = self.normalizer.normalize_pages((page["page_number"], page["text"]) for page in pages)
+        return {
+            "text_content": normalized["text_content"],
+            "offset_map": normalized["offset_map"],
+            # Per-page text and heading candidates, for building a DocumentMap
+            "page_texts": normalized["page_texts"],
+            "page_layouts": [
+                {"page_number": page["page_number"], "headings": page["headings"], "font_sizes": page["font_sizes"]}
+                for page in pages
+            ],
+            "table_rows": self.table_rows,
+            "table_content": self.table_processor.format_table_data(self.table_rows),
+            "image_content": "\n".join(text for page in pages for text in page["image_texts"])
+        }
+
     def extract_tables(self) -> str:
         """Extract tables from PDF"""
         if not self.pdf:
@@ -56,7 +264,8 @@ class PDFExtractor:
 
         try:
             # Use table processor to extract tables
-            table_content = self.table_processor.process_tables(self.pdf.pages)
+            self.table_rows = self.table_processor.extract_table_data(self.pdf.pages)
+            table_content = self.table_processor.format_table_data(self.table_rows)
             self.logger.debug(f"Extracted table content length: {len(table_content)}")
             return table_content
 
@@ -73,7 +282,7 @@ class PDFExtractor:
             # Use table processor to extract tables
             image_content = self.image_processor.process_images(self.pdf.pages)
             # self.logger.debug(f"Extracted table content length: {len(image_content)}")
-            return image_content.join("\n")
+            return "\n".join(image_content)
 
         except Exception as e:
             self.logger.error(f"Error extracting tables: {str(e)}")
@@ -81,5 +290,7 @@ class PDFExtractor:
 
     def close(self):
         """Close the PDF file"""
+        self.image_processor.close()
         if self.pdf:
             self.pdf.close()
+            self.pdf = None
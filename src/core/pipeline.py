@@ -0,0 +1,125 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from src.core.instrumentation import get_instrumentation
+
+_DONE = object()
+
+
+class _StageError:
+    def __init__(self, stage: str, error: BaseException):
+        self.stage = stage
+        self.error = error
+
+
+class Pipeline:
+    """Runs each stage in its own thread, connected by bounded queues.
+
+    A stage maps one item to one item. A full queue blocks the stage that feeds it,
+    so at most queue_size items wait between any two stages and memory stays bounded
+    however long the input is. Items come out in input order. The slowest stage sets
+    the pace, and stages that wait on I/O or subprocesses overlap with the others and
+    with the consumer.
+    """
+
+    def __init__(self, stages: List[Tuple[str, Callable[[Any], Any]]], queue_size: int = 4):
+        self.logger = logging.getLogger(__name__)
+        self.stages = stages
+        self.queue_size = queue_size
+        self._queues: List[queue.Queue] = []
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._finished = False  # The consumer has seen the end of the output
+
+    def start(self, source: Iterable[Any]) -> "Pipeline":
+        self._queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        self._threads = [threading.Thread(target=self._feed, args=(iter(source),), name="pipeline-source",
+                                          daemon=True)]
+        for position, (name, function) in enumerate(self.stages):
+            self._threads.append(threading.Thread(target=self._work, args=(position, name, function),
+                                                  name=f"pipeline-{name}", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def _put(self, position: int, item: Any, name: str) -> bool:
+        """Put into queue position, waiting for space; False once the pipeline is stopped"""
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                self._queues[position].put(item, timeout=0.1)
+                get_instrumentation().record_time(f"pipeline_{name}_blocked", time.perf_counter() - start)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, position: int) -> Any:
+        while not self._stop.is_set():
+            try:
+                return self._queues[position].get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _feed(self, source: Iterator[Any]) -> None:
+        try:
+            for item in source:
+                if not self._put(0, item, "source"):
+                    return
+        except Exception as e:
+            self._put(0, _StageError("source", e), "source")
+            return
+        self._put(0, _DONE, "source")
+
+    def _work(self, position: int, name: str, function: Callable[[Any], Any]) -> None:
+        instrumentation = get_instrumentation()
+        while True:
+            item = self._get(position)
+            if item is _DONE or isinstance(item, _StageError):
+                self._put(position + 1, item, name)
+                return
+            try:
+                with instrumentation.timer(f"pipeline_{name}"):
+                    result = function(item)
+            except Exception as e:
+                self.logger.error(f"Error in pipeline stage {name}: {str(e)}")
+                self._put(position + 1, _StageError(name, e), name)
+                return
+            if not self._put(position + 1, result, name):
+                return
+
+    def _unwrap(self, item: Any) -> Any:
+        if isinstance(item, _StageError):
+            raise item.error
+        return item
+
+    def __iter__(self) -> Iterator[Any]:
+        while not self._finished:
+            item = self._get(len(self.stages))
+            if item is _DONE:
+                self._finished = True
+                return
+            yield self._unwrap(item)
+
+    def ready(self) -> Optional[Any]:
+        """The next output if it is already finished, else None without waiting"""
+        if self._finished:
+            return None
+        try:
+            item = self._queues[-1].get_nowait()
+        except queue.Empty:
+            return None
+        if item is _DONE:
+            self._finished = True
+            return None
+        return self._unwrap(item)
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """Stop every stage, e.g. when the consumer needs no more items, and wait for the threads"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
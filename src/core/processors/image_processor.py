@@ -1,16 +1,33 @@
+import hashlib
 import logging
-from typing import List, Optional
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
 from PIL import Image
 import io
 
+from src.core.instrumentation import get_instrumentation
+
 class ImageProcessor:
     """Handles image extraction and OCR from PDF pages"""
-    
-    def __init__(self, enable_ocr: bool = False):
+
+    def __init__(self, enable_ocr: bool = False, max_workers: Optional[int] = None, min_pixels: int = 32,
+                 min_display_points: float = 24.0, max_side: int = 2000, binarize_threshold: Optional[int] = 160,
+                 ocr_cache_dir: Optional[str] = None, lang: str = "eng"):
         self.logger = logging.getLogger(__name__)
         self.enable_ocr = enable_ocr
         self.tesseract_available = False
-        
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self.min_pixels = min_pixels  # Skip images smaller than this in either pixel dimension
+        self.min_display_points = min_display_points  # Skip images drawn smaller than this on the page
+        self.max_side = max_side  # Downscale larger images before OCR
+        self.binarize_threshold = binarize_threshold  # None keeps grayscale
+        self.lang = lang  # Tesseract language(s), e.g. "eng+swe"
+        self.ocr_cache_dir = ocr_cache_dir
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._seen: Dict[str, Future] = {}  # image hash -> OCR future, for the current document
+        self._ocr_fingerprint: Optional[str] = None
+
         if enable_ocr:
             try:
                 import pytesseract
@@ -20,26 +37,140 @@ class ImageProcessor:
                 self.logger.warning("pytesseract not installed. OCR features will be disabled.")
             except Exception as e:
                 self.logger.warning(f"Error initializing tesseract: {str(e)}. OCR features will be disabled.")
-    
+
+        if ocr_cache_dir:
+            os.makedirs(ocr_cache_dir, exist_ok=True)
+
     def process_images(self, pages) -> List[str]:
         """Extract and process images from PDF pages"""
         images_text = []
-        
+
         if not self.enable_ocr or not self.tesseract_available:
             return images_text
-            
+
         try:
-            for page in pages:
-                for image in page.images:
-                    try:
-                        img = Image.open(io.BytesIO(image['stream'].get_data()))
-                        text = self.pytesseract.image_to_string(img)
-                        if text.strip():
-                            images_text.append(text)
-                    except Exception as e:
-                        self.logger.error(f"Error processing image: {str(e)}")
-                        continue
-            return images_text
+            # Submit every page first so OCR of all images runs concurrently
+            futures = [future for page in pages for future in self.submit_page(page)]
+            return self.collect(futures)
         except Exception as e:
             self.logger.error(f"Error processing images: {str(e)}")
-            return images_text 
\ No newline at end of file
+            return images_text
+
+    def submit_page(self, page) -> List[Future]:
+        """Queue OCR for the new, non-decorative images of a page.
+
+        Image bytes are read here, while the page is still open; decoding and OCR run
+        on the thread pool. Images already seen in this document are not queued again.
+        """
+        if not self.enable_ocr or not self.tesseract_available:
+            return []
+
+        futures = []
+        instrumentation = get_instrumentation()
+        for image in page.images:
+            try:
+                if self._is_decorative(image):
+                    instrumentation.increment("images_skipped_decorative")
+                    continue
+                data = image['stream'].get_data()
+                image_hash = hashlib.sha256(data).hexdigest()
+                if image_hash in self._seen:
+                    instrumentation.increment("images_skipped_duplicate")
+                    continue
+                instrumentation.increment("images_queued")
+                self._seen[image_hash] = self._get_executor().submit(self._ocr, image_hash, data)
+                futures.append(self._seen[image_hash])
+            except Exception as e:
+                self.logger.error(f"Error processing image: {str(e)}")
+                continue
+        return futures
+
+    def collect(self, futures: List[Future]) -> List[str]:
+        """Wait for OCR futures and return the non-empty texts in submission order"""
+        images_text = []
+        for future in futures:
+            try:
+                text = future.result()
+                if text.strip():
+                    images_text.append(text)
+            except Exception as e:
+                self.logger.error(f"Error processing image: {str(e)}")
+        return images_text
+
+    def reset(self) -> None:
+        """Forget which images were seen, before processing another document"""
+        self._seen = {}
+
+    def close(self) -> None:
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # pytesseract runs tesseract as a subprocess, so threads are enough for parallel OCR
+        if not self._executor:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ocr")
+        return self._executor
+
+    def _is_decorative(self, image) -> bool:
+        """Tiny images (icons, rules, bullets) rarely hold text worth OCR'ing"""
+        src_width, src_height = image.get('srcsize') or (self.min_pixels, self.min_pixels)
+        if min(src_width, src_height) < self.min_pixels:
+            return True
+        return min(image.get('width', self.min_display_points),
+                   image.get('height', self.min_display_points)) < self.min_display_points
+
+    def _ocr(self, image_hash: str, data: bytes) -> str:
+        instrumentation = get_instrumentation()
+        cache_key = self._cache_key(image_hash)
+        cached = self._read_cache(cache_key)
+        if cached is not None:
+            instrumentation.increment("ocr_cache_hits")
+            return cached
+
+        with instrumentation.timer("ocr_image"):
+            img = self._prepare(Image.open(io.BytesIO(data)))
+            text = self.pytesseract.image_to_string(img, lang=self.lang)
+        self._write_cache(cache_key, text)
+        return text
+
+    def _prepare(self, img: Image.Image) -> Image.Image:
+        """Grayscale, downscale and optionally binarize an image for OCR"""
+        img = img.convert("L")
+        if max(img.size) > self.max_side:
+            img.thumbnail((self.max_side, self.max_side))
+        if self.binarize_threshold is not None:
+            threshold = self.binarize_threshold
+            img = img.point(lambda p: 255 if p > threshold else 0)
+        return img
+
+    def _cache_key(self, image_hash: str) -> str:
+        """Disk cache key of an image: its hash combined with everything that changes the OCR text"""
+        if self._ocr_fingerprint is None:
+            try:
+                version = str(self.pytesseract.get_tesseract_version())
+            except Exception as e:
+                self.logger.warning(f"Error reading tesseract version: {str(e)}")
+                version = "unknown"
+            self._ocr_fingerprint = f"{self.max_side}:{self.binarize_threshold}:{self.lang}:{version}"
+        return hashlib.sha256(f"{self._ocr_fingerprint}:{image_hash}".encode()).hexdigest()
+
+    def _read_cache(self, cache_key: str) -> Optional[str]:
+        if not self.ocr_cache_dir:
+            return None
+        path = os.path.join(self.ocr_cache_dir, cache_key + ".txt")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def _write_cache(self, cache_key: str, text: str) -> None:
+        if not self.ocr_cache_dir:
+            return
+        path = os.path.join(self.ocr_cache_dir, cache_key + ".txt")
+        try:
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(path + ".tmp", path)
+        except Exception as e:
+            self.logger.error(f"Error caching OCR result: {str(e)}")
@@ -144,12 +144,49 @@ import logging
 from typing import List, Dict
 import pdfplumber
 
+from src.core.instrumentation import get_instrumentation
+
 class TableProcessor:
     """Handles table extraction and processing from PDFs"""
 
-    def __init__(self):
+    LINES_SETTINGS = {
+        'vertical_strategy': 'lines',
+        'horizontal_strategy': 'lines',
+        'intersection_y_tolerance': 10,
+        'intersection_x_tolerance': 10
+    }
+    TEXT_SETTINGS = {
+        'vertical_strategy': 'text',
+        'horizontal_strategy': 'text',
+        'intersection_y_tolerance': 10,
+        'intersection_x_tolerance': 10
+    }
+
+    def __init__(self, min_rulings: int = 4, min_numeric_density: float = 0.15, text_fallback: bool = True):
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.DEBUG)
+        self.min_rulings = min_rulings  # Line/rect objects needed to try the 'lines' strategy
+        self.min_numeric_density = min_numeric_density  # Share of digit chars needed to try the 'text' strategy
+        self.text_fallback = text_fallback
+        self.pages_screened = 0
+        self.pages_skipped = 0
+        self.text_fallbacks = 0
+
+    def settings(self) -> Dict:
+        """Settings that change which tables are found, for extraction cache keys"""
+        return {
+            "table_min_rulings": self.min_rulings,
+            "table_min_numeric_density": self.min_numeric_density,
+            "table_text_fallback": self.text_fallback
+        }
+
+    def screen_page(self, page) -> tuple:
+        """Cheap (has_rulings, is_numeric) check from objects pdfplumber already parsed for the text"""
+        rulings = len(page.lines) + len(page.rects)
+        chars = [char["text"] for char in page.chars if not char["text"].isspace()]
+        digits = sum(1 for char in chars if char.isdigit())
+        numeric_density = digits / len(chars) if chars else 0.0
+        return rulings >= self.min_rulings, numeric_density >= self.min_numeric_density
 
     def clean_cell(self, cell: str) -> str:
         """Clean cell content"""
@@ -164,33 +201,64 @@ class TableProcessor:
         return not any(self.clean_cell(cell) for cell in row)
 
     def extract_table_data(self, pages) -> List[Dict]:
-        """Extract and structure table data from PDF pages"""
+        """Extract and structure table data from PDF pages.
+
+        Pages without rulings or numeric text are skipped. Ruled pages use the 'lines'
+        strategy; the 'text' strategy only runs on numeric pages where 'lines' found nothing.
+        """
         all_structured_data = []
+        instrumentation = get_instrumentation()
 
         try:
             for page_num, page in enumerate(pages, 1):
-                self.logger.debug(f"Processing page {page_num}")
-                tables = page.extract_tables({
-                    'vertical_strategy': 'lines',
-                    'horizontal_strategy': 'lines',
-                    'intersection_y_tolerance': 10,
-                    'intersection_x_tolerance': 10
-                })
-
-                if not tables:
-                    self.logger.debug(f"No tables found on page {page_num}")
+                self.pages_screened += 1
+                with instrumentation.timer("table_screen"):
+                    has_rulings, is_numeric = self.screen_page(page)
+                if not has_rulings and not (is_numeric and self.text_fallback):
+                    self.pages_skipped += 1
+                    instrumentation.increment("table_pages_skipped")
                     continue
 
-                for table_num, table in enumerate(tables, 1):
-                    self.logger.debug(f"Processing table {table_num} on page {page_num}")
-                    structured_data = self._process_table(table)
-                    if structured_data:
-                        all_structured_data.extend(structured_data)
+                self.logger.debug(f"Processing page {page_num}")
+                structured_data = []
+                if has_rulings:
+                    structured_data = self._extract_with(page, self.LINES_SETTINGS)
+                if not structured_data and is_numeric and self.text_fallback:
+                    self.text_fallbacks += 1
+                    instrumentation.increment("table_text_fallbacks")
+                    structured_data = self._extract_with(page, self.TEXT_SETTINGS, require_numbers=True)
+
+                if not structured_data:
+                    self.logger.debug(f"No tables found on page {page_num}")
+                all_structured_data.extend(structured_data)
         except Exception as e:
             self.logger.error(f"Error extracting table data: {str(e)}", exc_info=True)
 
         return all_structured_data
 
+    def _extract_with(self, page, table_settings: Dict, require_numbers: bool = False) -> List[Dict]:
+        """Structured rows of every table found on a page with the given table settings"""
+        instrumentation = get_instrumentation()
+        with instrumentation.timer("table_extract"):
+            tables = page.extract_tables(table_settings)
+
+        structured_data = []
+        for table_num, table in enumerate(tables or [], 1):
+            # The text strategy turns any aligned prose into a "table", so keep only numeric grids
+            if require_numbers and not self._looks_numeric(table):
+                continue
+            instrumentation.increment("tables_found")
+            self.logger.debug(f"Processing table {table_num} with the {table_settings['vertical_strategy']} strategy")
+            structured_data.extend(self._process_table(table))
+        return structured_data
+
+    def _looks_numeric(self, table: List[List[str]]) -> bool:
+        if len(table) < 2 or max(len(row) for row in table) < 2:
+            return False
+        cells = [self.clean_cell(cell) for row in table[1:] for cell in row[1:]]
+        numeric = sum(1 for cell in cells if cell and any(char.isdigit() for char in cell))
+        return numeric >= max(1, len(cells) // 3)
+
     def _process_table(self, table: List[List[str]]) -> List[Dict]:
         """Process a single table and structure its data"""
         if not table:
@@ -0,0 +1,163 @@
+import bisect
+import re
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Typographic characters folded to ASCII so numbers, units and words tokenize like typed text
+DEFAULT_REPLACEMENTS = {
+    "\ufb00": "ff", "\ufb01": "fi", "\ufb02": "fl", "\ufb03": "ffi", "\ufb04": "ffl",
+    "\u2010": "-", "\u2011": "-", "\u2012": "-", "\u2013": "-", "\u2014": "-", "\u2212": "-",
+    "\u2018": "'", "\u2019": "'", "\u201c": '"', "\u201d": '"',
+    "\u00b2": "2", "\u00b3": "3",
+    **{chr(0x2080 + digit): str(digit) for digit in range(10)}  # Subscript digits, as in CO₂e
+}
+
+
+class OffsetMap:
+    """Maps offsets in normalized document text back to (page number, offset in the page's raw text).
+
+    Only the points where normalization changed the text length are stored, plus one
+    point per page, so the map stays small next to the text itself.
+    """
+
+    def __init__(self):
+        self.normalized = array("q")
+        self.source = array("q")
+        self.pages = array("q")
+
+    def add_page(self, page_number: int, page_offset: int, normalized: Sequence[int], source: Sequence[int]) -> None:
+        """Append a page's breakpoints; page_offset is where the page starts in the document text"""
+        for normalized_offset, source_offset in zip(normalized, source):
+            self.normalized.append(page_offset + normalized_offset)
+            self.source.append(source_offset)
+            self.pages.append(page_number)
+
+    def locate(self, offset: int) -> Tuple[int, int]:
+        """(page number, raw page text offset) of a normalized document offset, (0, 0) when unknown"""
+        index = bisect.bisect_right(self.normalized, offset) - 1
+        if index < 0:
+            return 0, 0
+        return self.pages[index], self.source[index] + offset - self.normalized[index]
+
+    def __len__(self) -> int:
+        return len(self.normalized)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"normalized": self.normalized.tolist(), "source": self.source.tolist(), "pages": self.pages.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "OffsetMap":
+        offset_map = cls()
+        offset_map.normalized.extend(data.get("normalized", []))
+        offset_map.source.extend(data.get("source", []))
+        offset_map.pages.extend(data.get("pages", []))
+        return offset_map
+
+
+class TextNormalizer:
+    """Single-pass text normalization with configurable rules.
+
+    All rules are compiled into one pattern and applied in one scan, so each page is
+    copied once. Runs of whitespace and separator characters become one space,
+    deleted characters vanish, typographic characters are replaced and, optionally,
+    non-ASCII characters and listed words are dropped. Decimals and parenthesised
+    text are always kept: they are what most questions ask about.
+    """
+
+    def __init__(self, replacements: Optional[Dict[str, str]] = None, separators: str = "|\u2022\u00b7",
+                 deleted: str = "\u25aa\u00ad\u200b\ufeff", ascii_only: bool = False,
+                 drop_words: Sequence[str] = (), collapse_dots: bool = True):
+        self.replacements = DEFAULT_REPLACEMENTS if replacements is None else replacements
+        self.separators = separators
+        self.deleted = set(deleted)
+        self.ascii_only = ascii_only
+        self.drop_words = tuple(drop_words)
+        self.collapse_dots = collapse_dots
+
+        replaced = "".join(re.escape(char) for char in self.replacements)
+        extra = "".join(re.escape(char) for char in separators + deleted)
+        # Separator characters other than a plain space: a run must contain one to need rewriting
+        irregular = rf"[^\S ]|[{extra}]" if extra else r"[^\S ]"
+        if ascii_only:
+            irregular += rf"|(?![{replaced}])[^\x00-\x7f]" if replaced else r"|[^\x00-\x7f]"
+        separator = rf"(?:\s|{irregular})"
+        rules = []
+        if replaced:
+            rules.append(rf"(?P<replace>[{replaced}])")
+        rules.append(rf"(?P<separator>{separator}*(?:{irregular}){separator}*| {{2,}})")
+        if collapse_dots:
+            rules.append(r"(?P<dots>\.{2,})")
+        if self.drop_words:
+            words = "|".join(re.escape(word) for word in self.drop_words)
+            rules.append(rf"(?P<word>(?i:\b(?:{words})\b) ?)")
+        self._pattern = re.compile("|".join(rules))
+        self._leading = re.compile(f"{separator}*")
+
+    def settings(self) -> Dict[str, Any]:
+        """Rules that change the normalized text, for cache keys"""
+        return {
+            "replacements": self.replacements,
+            "separators": self.separators,
+            "deleted": "".join(sorted(self.deleted)),
+            "ascii_only": self.ascii_only,
+            "drop_words": list(self.drop_words),
+            "collapse_dots": self.collapse_dots
+        }
+
+    def normalize(self, text: str) -> Tuple[str, List[int], List[int]]:
+        """Normalized text plus its breakpoints: parallel lists of (normalized, source) offsets
+        from which the source offset of any normalized offset follows by counting forward.
+        """
+        if not text:
+            return "", [0], [0]
+        position = self._leading.match(text).end()
+        normalized_points, source_points = [0], [position]
+        pieces = []
+        length = 0
+        for match in self._pattern.finditer(text, position):
+            start, end = match.span()
+            if start > position:
+                pieces.append(text[position:start])
+                length += start - position
+            kind = match.lastgroup
+            if kind == "replace":
+                replacement = self.replacements[match.group()]
+            elif kind == "separator":
+                run = match.group()
+                replacement = "" if all(char in self.deleted for char in run) else " "
+            elif kind == "dots":
+                replacement = "."
+            else:
+                replacement = ""
+            pieces.append(replacement)
+            length += len(replacement)
+            position = end
+            if len(replacement) != end - start:
+                normalized_points.append(length)
+                source_points.append(end)
+        pieces.append(text[position:])
+        # Trailing characters only shorten the text, so no breakpoint is needed
+        return "".join(pieces).rstrip(), normalized_points, source_points
+
+    def clean(self, text: str) -> str:
+        return self.normalize(text)[0] if text else ""
+
+    def normalize_pages(self, pages: Iterable[Tuple[int, str]]) -> Dict[str, Any]:
+        """Normalize (page number, raw text) pairs one page at a time.
+
+        Returns the page texts, the document text (page texts joined by single spaces,
+        so page offsets can be computed from the page lengths) and the document's OffsetMap.
+        """
+        page_texts = []
+        offset_map = OffsetMap()
+        offset = 0
+        for page_number, raw_text in pages:
+            text, normalized_points, source_points = self.normalize(raw_text or "")
+            offset_map.add_page(page_number, offset, normalized_points, source_points)
+            page_texts.append(text)
+            offset += len(text) + 1
+        return {
+            "page_texts": page_texts,
+            "text_content": " ".join(page_texts) if any(page_texts) else "",
+            "offset_map": offset_map
+        }
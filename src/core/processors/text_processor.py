@@ -1,55 +1,94 @@
 import logging
-import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.core.instrumentation import get_instrumentation
+from src.core.processors.text_normalizer import TextNormalizer
 
 
 class TextProcessor:
     """Handles text extraction and processing from PDF pages"""
 
-    def __init__(self):
+    def __init__(self, normalizer: Optional[TextNormalizer] = None):
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.DEBUG)
+        self.normalizer = normalizer or TextNormalizer()
+        self._tokenized: Tuple[Any, Dict[str, Any]] = (None, {})  # Last (key, tokenization) pair
 
     def clean_text(self, text: str) -> str:
-        """Clean and normalize text content"""
-        if not text:
-            return ""
-        """Clean and preprocess the extracted text."""
-        # Remove extra spaces and special characters
-        text = re.sub(r'\s+', ' ', text)  # Replace multiple spaces with a single space
-        text = re.sub(r'[^\x00-\x7F]+', ' ', text)  # Remove non-ASCII characters
-        # Remove bullet points and other formatting artifacts
-        text = re.sub(r'▪', '', text)  # Remove bullet points
-        text = re.sub(r'\d+\.\d+', '', text)  # Remove decimal numbers (if irrelevant)
-        text = re.sub(r'[\(\[].*?[\)\]]', '', text)  # Remove text inside parentheses or brackets
-        text = re.sub(r'\b(?:page|pages?|section|question|answer)\b', '', text,
-                      flags=re.I)  # Remove irrelevant keywords like 'page', 'question', etc.
-        return text
+        """Clean and normalize text content in a single pass, keeping numbers and parenthesised text"""
+        return self.normalizer.clean(text)
 
     def split_into_chunks(self, text, max_length=1024, overlap=200):
-        """Split text into overlapping chunks while preserving logical sections."""
-        sections = text.split("\n\n")  # Split by double newlines (paragraphs)
+        """Split text into chunks of at most max_length characters, each repeating about the
+        last overlap characters of the previous one.
+
+        Chunks end at a paragraph break when there is one in the second half of the chunk,
+        otherwise at a sentence end or a space, so normalized single-line text is split too.
+        """
+        text = text.strip()
         chunks = []
-        current_chunk = ""
-
-        for section in sections:
-            # If adding this section would exceed the max_length, finalize the current chunk
-            if len(current_chunk) + len(section) > max_length:
-                if current_chunk.strip():  # Only add non-empty chunks
-                    chunks.append(current_chunk.strip())
-                current_chunk = ""
-
-            # Add the section to the current chunk
-            current_chunk += section + "\n\n"
-
-        # Add the last chunk if it's not empty
-        if current_chunk.strip():
-            chunks.append(current_chunk.strip())
-
-        # Apply overlapping to the chunks
-        overlapping_chunks = []
-        for i in range(0, len(chunks), max_length - overlap):
-            overlapping_chunk = " ".join(chunks[i:i + max_length])
-            if overlapping_chunk.strip():  # Only add non-empty chunks
-                overlapping_chunks.append(overlapping_chunk)
-
-        return overlapping_chunks
+        start = 0
+        while start < len(text):
+            end = min(start + max_length, len(text))
+            if end < len(text):
+                window = text[start:end]
+                half = len(window) // 2
+                for separator in ("\n\n", ". ", " "):
+                    cut = window.rfind(separator, half)
+                    if cut > 0:
+                        end = start + cut + (1 if separator == ". " else 0)
+                        break
+            chunk = text[start:end].strip()
+            if chunk:
+                chunks.append(chunk)
+            if end >= len(text):
+                break
+            # Start the next chunk at a word boundary about overlap characters back
+            next_start = max(end - overlap, start + 1)
+            space = text.find(" ", next_start, end)
+            start = space + 1 if space != -1 else next_start
+
+        get_instrumentation().observe("chunk_count", len(chunks))
+        return chunks
+
+    def tokenize(self, text: str, tokenizer) -> Dict[str, Any]:
+        """Tokenize a whole document once, keeping token ids and character offsets"""
+        key = (id(tokenizer), len(text), hash(text))
+        if self._tokenized[0] == key:
+            return self._tokenized[1]
+
+        encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+        tokenized = {"input_ids": encoding["input_ids"], "offsets": encoding["offset_mapping"]}
+        self._tokenized = (key, tokenized)
+        return tokenized
+
+    def split_into_token_windows(self, text: str, tokenizer, window_size: int = 384,
+                                 stride: int = 128) -> List[Dict[str, Any]]:
+        """Split text into fixed-size token windows overlapping by stride tokens.
+
+        Each window keeps its token ids and offsets relative to its own text so it can
+        be fed to the model without being tokenized again.
+        """
+        if not text:
+            return []
+
+        instrumentation = get_instrumentation()
+        with instrumentation.timer("tokenize"):
+            tokenized = self.tokenize(text, tokenizer)
+        input_ids, offsets = tokenized["input_ids"], tokenized["offsets"]
+        step = max(window_size - stride, 1)
+
+        windows = []
+        for start in range(0, len(input_ids), step):
+            end = min(start + window_size, len(input_ids))
+            base = offsets[start][0]
+            windows.append({
+                "start": base,  # Character offset of the window in text
+                "text": text[base:offsets[end - 1][1]],
+                "input_ids": input_ids[start:end],
+                "offsets": [(char_start - base, char_end - base) for char_start, char_end in offsets[start:end]]
+            })
+            if end == len(input_ids):
+                break
+        instrumentation.observe("chunk_count", len(windows))
+        return windows
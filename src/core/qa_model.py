@@ -1,109 +1,364 @@
-from transformers import AutoTokenizer, AutoModelForQuestionAnswering
-import torch
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+import gc
 import logging
+import threading
+
+from src.core.context_cache import ContextEncodingCache
+from src.core.instrumentation import get_instrumentation
+from src.core.processors.text_processor import TextProcessor
+
+# torch and transformers are imported lazily so extraction-only workloads start fast
+
+DEFAULT_MODEL_NAME = "deepset/bert-large-uncased-whole-word-masking-squad2"
+BACKENDS = ("torch", "torch-int8", "onnx")
+
+# Process-wide model and tokenizer instances, shared by every QAModel and QAService
+_shared_tokenizers: Dict[str, Any] = {}
+_shared_models: Dict[Tuple[str, str, str], Any] = {}
+_shared_lock = threading.Lock()
+
+
+def detect_device() -> str:
+    """Return the torch device to run on: cuda when a GPU is usable, otherwise cpu"""
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def get_shared_tokenizer(model_name: str):
+    """Load a tokenizer once per process"""
+    with _shared_lock:
+        if model_name not in _shared_tokenizers:
+            from transformers import AutoTokenizer
+            _shared_tokenizers[model_name] = AutoTokenizer.from_pretrained(model_name)
+        return _shared_tokenizers[model_name]
+
+
+def get_shared_model(model_name: str, backend: str, device: str):
+    """Load a model once per process for a (model, backend, device) combination"""
+    key = (model_name, backend, device)
+    with _shared_lock:
+        if key not in _shared_models:
+            _shared_models[key] = _load_model(model_name, backend, device)
+        return _shared_models[key]
+
+
+def register_shared_model(model_name: str, tokenizer, model, backend: str = "torch", device: str = "cpu") -> None:
+    """Make an already constructed tokenizer and model the shared instances for model_name"""
+    with _shared_lock:
+        _shared_tokenizers[model_name] = tokenizer
+        _shared_models[(model_name, backend, device)] = model
+
+
+def _load_model(model_name: str, backend: str, device: str):
+    if backend == "onnx":
+        try:
+            from optimum.onnxruntime import ORTModelForQuestionAnswering
+        except ImportError:
+            raise Exception("The onnx backend requires optimum[onnxruntime] to be installed")
+        # Export the model to ONNX and open it with an ONNX Runtime session
+        return ORTModelForQuestionAnswering.from_pretrained(model_name, export=True)
+
+    import torch
+    from transformers import AutoModelForQuestionAnswering
+    model = AutoModelForQuestionAnswering.from_pretrained(model_name)
+    model.eval()
+    if backend == "torch-int8":
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    logging.getLogger("transformers.modeling_utils").setLevel(logging.ERROR)
+    return model.to(device)
+
+
+def warm_up_for_fork(model_name: str = DEFAULT_MODEL_NAME, backend: str = "torch") -> "QAModel":
+    """Load and exercise the shared model before forking worker processes.
+
+    Children inherit the weights copy-on-write. gc.freeze moves everything loaded so
+    far out of the collector's view so later collections in the children do not
+    touch (and so copy) those pages.
+    """
+    qa_model = QAModel(model_name=model_name, backend=backend)
+    qa_model.get_answer("What is this?", "This is a warm-up run.")
+    gc.collect()
+    gc.freeze()
+    return qa_model
 
 
 class QAModel:
     """Handles the question-answering model operations"""
 
-    def __init__(self):
-        self.model_name = "deepset/bert-large-uncased-whole-word-masking-squad2"
-        self.tokenizer = None
-        self.model = None
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, backend: str = "torch", device: Optional[str] = None,
+                 lazy: bool = True):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend}, expected one of {BACKENDS}")
+
+        self.model_name = model_name
+        self.backend = backend
+        self._tokenizer = None
+        self._model = None
+        self._device = device
         self.max_length = 512
         self.stride = 128
-        self.max_context_size = 1000  # Limit context size for faster processing
-        self.device = 0
-        self.load_model()
+        self.max_question_length = 64
+        self.max_answer_length = 30
+        self.text_processor = TextProcessor()
+        if not lazy:
+            self.load_model()
+
+    @property
+    def device(self) -> str:
+        if self._device is None:
+            # Quantized and ONNX Runtime backends run on CPU
+            self._device = detect_device() if self.backend == "torch" else "cpu"
+        return self._device
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            self._tokenizer = get_shared_tokenizer(self.model_name)
+        return self._tokenizer
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = get_shared_model(self.model_name, self.backend, self.device)
+        return self._model
 
     def load_model(self):
-        """Loads the QA model and tokenizer"""
+        """Loads the QA model and tokenizer for the configured backend"""
         try:
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            self.model = AutoModelForQuestionAnswering.from_pretrained(self.model_name)
-            # Move model to GPU if available
-            if torch.cuda.is_available():
-                self.model = self.model.cuda()
-            logging.getLogger("transformers.modeling_utils").setLevel(logging.ERROR)
+            return self.tokenizer, self.model
         except Exception as e:
             raise Exception(f"Error loading model: {str(e)}")
 
+    def pipeline_device(self) -> Optional[int]:
+        """Device argument for transformers.pipeline, None when the model places itself"""
+        if self.backend == "onnx":
+            return None
+        return 0 if self.device == "cuda" else -1
+
     def preprocess_context(self, context: str) -> str:
         """Preprocess the context to make it more QA-friendly"""
-        # Basic cleaning
-        context = " ".join(context.split())
-        context = context.replace("\n", ". ")
-        context = context.replace("..", ".")
-        # Limit context size
-        return context[:self.max_context_size]
+        return self.text_processor.clean_text(context)
+
+    def make_windows(self, context: str) -> List[Dict[str, Any]]:
+        """Token windows covering the whole context, sized to fit next to a question"""
+        return self.text_processor.split_into_token_windows(
+            context, self.tokenizer, window_size=self.max_length - self.max_question_length - 3, stride=self.stride
+        )
 
     def get_answer(self, question: str, context: str) -> Dict[str, Any]:
         """Gets answer for a question from given context"""
         if not self.model or not self.tokenizer:
             raise Exception("Model not loaded")
 
-        # Preprocess the context
-        context = self.preprocess_context(context)
+        # Score every window of the context instead of truncating it
+        windows = self.make_windows(self.preprocess_context(context))
+        results = self.score_windows([question] * len(windows), windows)
+        best = max(results, key=lambda result: result["score"], default=None)
 
-        # Tokenize input
-        encoding = self.tokenizer(
-            question,
-            context,
-            max_length=self.max_length,
-            truncation='only_second',
-            return_tensors="pt"
-        )
+        if not best or not best["answer"]:
+            return {
+                "answer": "No answer found",
+                "score": 0.0,
+                "start": 0,
+                "end": 0
+            }
+        return best
 
-        # Move inputs to GPU if available
-        if torch.cuda.is_available():
-            encoding = {k: v.cuda() for k, v in encoding.items()}
+    def score_windows(self, questions: List[str], windows: List[Dict[str, Any]], batch_size: int = 16,
+                      context_cache: Optional[ContextEncodingCache] = None) -> List[Dict[str, Any]]:
+        """Answer (question, window) pairs from pre-tokenized windows in padded batches.
 
-        # Get model output
-        outputs = self.model(**encoding)
+        Only questions are tokenized here; window token ids come from the chunker and their
+        tensors from context_cache when given. Scores are start/end probabilities like the
+        transformers pipeline: normalized over [CLS] and the context, so a window the model
+        thinks has no answer gives every span a low score.
+        """
+        import torch
+        if not self.model or not self.tokenizer:
+            raise Exception("Model not loaded")
 
-        # Get start and end logits
-        start_logits = outputs.start_logits[0]
-        end_logits = outputs.end_logits[0]
+        context_cache = context_cache or ContextEncodingCache()
+        question_parts = {question: self._question_parts(question) for question in set(questions)}
+        cls_token_id = self.tokenizer.cls_token_id
 
-        # Get best answer span
-        start_idx = torch.argmax(start_logits)
-        end_idx = torch.argmax(end_logits)
+        results = []
+        for start in range(0, len(questions), batch_size):
+            batch = list(zip(questions[start:start + batch_size], windows[start:start + batch_size]))
+            sequences, segments, spans = [], [], []
+            for question, window in batch:
+                prefix, suffix = question_parts[question]
+                context = context_cache.context_tensor(window, self._context_tensor)
+                context = context[:self.max_length - len(prefix) - len(suffix)]
+                sequences.append(torch.cat([prefix, context, suffix]))
+                segments.append(len(prefix))
+                spans.append((len(prefix), len(context)))
 
-        # Convert to CPU for numpy operations
-        if torch.cuda.is_available():
-            start_idx = start_idx.cpu()
-            end_idx = end_idx.cpu()
+            outputs = self._forward(sequences, segments)
+            for i, (_, window) in enumerate(batch):
+                context_start, context_length = spans[i]
+                has_null = cls_token_id is not None and int(sequences[i][0]) == cls_token_id
+                results.append(self._best_span(
+                    outputs.start_logits[i], outputs.end_logits[i], context_start, context_length, window, has_null
+                ))
+        return results
 
-        # Get confidence score
-        confidence = float(torch.max(start_logits) + torch.max(end_logits))
+    def _question_parts(self, question: str):
+        """Special-token template around the context for a question, as (prefix, suffix) tensors"""
+        import torch
+        question_ids = self.tokenizer(question, add_special_tokens=False)["input_ids"][:self.max_question_length]
+        # Use a placeholder context to find where the context goes in this tokenizer's template
+        template = self.tokenizer.build_inputs_with_special_tokens(question_ids, [-1])
+        split = template.index(-1)
+        return torch.tensor(template[:split], dtype=torch.long), torch.tensor(template[split + 1:], dtype=torch.long)
 
-        # Get answer tokens
-        input_ids = encoding["input_ids"][0]
-        tokens = self.tokenizer.convert_ids_to_tokens(input_ids)
+    def _context_tensor(self, window: Dict[str, Any]):
+        import torch
+        return torch.tensor(window["input_ids"], dtype=torch.long)
 
-        # Convert tokens to answer text
-        if end_idx >= start_idx:
-            answer_tokens = tokens[start_idx:end_idx + 1]
-            answer = self.tokenizer.convert_tokens_to_string(answer_tokens)
-        else:
-            answer = ""
+    def _forward(self, sequences: List[Any], first_segment_lengths: List[int]):
+        """Run the model on a padded batch of input id tensors"""
+        import torch
+        lengths = [len(sequence) for sequence in sequences]
+        max_len = max(lengths)
+        pad_id = self.tokenizer.pad_token_id or 0
+        input_ids = torch.nn.utils.rnn.pad_sequence(sequences, batch_first=True, padding_value=pad_id)
+        positions = torch.arange(max_len).unsqueeze(0)
+        attention_mask = (positions < torch.tensor(lengths).unsqueeze(1)).long()
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.tokenizer.model_input_names:
+            # Everything after the question segment belongs to the context segment
+            context_mask = positions >= torch.tensor(first_segment_lengths).unsqueeze(1)
+            inputs["token_type_ids"] = (context_mask.long() * attention_mask)
 
-        # Clean up the answer
-        answer = answer.strip()
-        answer = answer.replace("[CLS]", "").replace("[SEP]", "").strip()
+        if self.device != "cpu":
+            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        instrumentation = get_instrumentation()
+        instrumentation.observe("batch_size", len(sequences))
+        instrumentation.observe("batch_tokens", len(sequences) * max_len)
+        with instrumentation.timer("model_forward"), torch.no_grad():
+            return self.model(**inputs)
 
-        if not answer:
-            return {
-                "answer": "No answer found",
-                "score": 0.0,
-                "start": 0,
-                "end": 0
-            }
+    def supports_late_interaction(self) -> bool:
+        """Late interaction needs direct access to the transformer encoder"""
+        return self.backend != "onnx" and hasattr(self.model, "base_model")
+
+    def _token_embeddings(self, input_ids) -> Any:
+        """L2-normalized last hidden states of the encoder for a single sequence"""
+        import torch
+        input_ids = input_ids.unsqueeze(0).to(self.device)
+        with get_instrumentation().timer("encoder_forward"), torch.no_grad():
+            hidden = self.model.base_model(input_ids=input_ids).last_hidden_state[0]
+        return torch.nn.functional.normalize(hidden.float(), dim=-1).cpu()
+
+    def _window_embeddings(self, windows: List[Dict[str, Any]]) -> List[Any]:
+        """L2-normalized encoder states of each window's tokens, encoded in one padded batch"""
+        import torch
+        sequences = [
+            torch.tensor(self.tokenizer.build_inputs_with_special_tokens(window["input_ids"][:self.max_length - 2]),
+                         dtype=torch.long)
+            for window in windows
+        ]
+        lengths = [len(sequence) for sequence in sequences]
+        input_ids = torch.nn.utils.rnn.pad_sequence(sequences, batch_first=True,
+                                                    padding_value=self.tokenizer.pad_token_id or 0)
+        attention_mask = (torch.arange(input_ids.shape[1]).unsqueeze(0) < torch.tensor(lengths).unsqueeze(1)).long()
+        instrumentation = get_instrumentation()
+        instrumentation.observe("encoder_batch_size", len(windows))
+        with instrumentation.timer("encoder_forward"), torch.no_grad():
+            hidden = self.model.base_model(input_ids=input_ids.to(self.device),
+                                           attention_mask=attention_mask.to(self.device)).last_hidden_state
+        hidden = torch.nn.functional.normalize(hidden.float(), dim=-1).cpu()
+        return [hidden[i, :length] for i, length in enumerate(lengths)]
+
+    def late_interaction_scores(self, question: str, windows: List[Dict[str, Any]],
+                                context_cache: ContextEncodingCache, batch_size: int = 16) -> List[float]:
+        """ColBERT-style MaxSim relevance of each window to the question.
+
+        Window embeddings are computed once per document and reused for every question, so
+        only the question is encoded per call. Windows missing from the cache are encoded
+        together in padded batches of batch_size.
+        """
+        import torch
+        question_ids = self.tokenizer(question, add_special_tokens=False)["input_ids"][:self.max_question_length]
+        question_embeddings = self._token_embeddings(
+            torch.tensor(self.tokenizer.build_inputs_with_special_tokens(question_ids), dtype=torch.long)
+        )
+
+        encoded: Dict[int, Any] = {}
+        missing = [index for index, window in enumerate(windows) if not context_cache.has_embeddings(window)]
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            for index, embeddings in zip(batch, self._window_embeddings([windows[index] for index in batch])):
+                encoded[index] = context_cache.context_embeddings(windows[index], lambda _: embeddings)
+
+        scores = []
+        for index, window in enumerate(windows):
+            window_embeddings = encoded.get(index)
+            if window_embeddings is None:
+                window_embeddings = context_cache.context_embeddings(
+                    window, lambda window: self._window_embeddings([window])[0]
+                )
+            scores.append(float((question_embeddings @ window_embeddings.T).max(dim=1).values.sum()))
+        return scores
+
+    def embed_texts(self, texts: List[str], batch_size: int = 16):
+        """Mean-pooled, L2-normalized encoder states of each text as a float32 numpy array.
+
+        Uses the reader's own encoder, so corpus retrieval needs no second model. The onnx
+        backend exposes only the QA head, so it cannot embed texts.
+        """
+        if not self.supports_late_interaction():
+            raise ValueError(f"Text embeddings need the transformer encoder, which the {self.backend} "
+                             f"backend does not expose; use the torch backend")
+        import numpy as np
+        import torch
+        embeddings = []
+        for start in range(0, len(texts), batch_size):
+            inputs = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=True,
+                                    max_length=self.max_length, return_tensors="pt")
+            inputs = {key: value.to(self.device) for key, value in inputs.items()}
+            with get_instrumentation().timer("encoder_forward"), torch.no_grad():
+                hidden = self.model.base_model(**inputs).last_hidden_state
+            mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+            embeddings.append(torch.nn.functional.normalize(pooled.float(), dim=-1).cpu().numpy())
+        if not embeddings:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.concatenate(embeddings)
+
+    def _best_span(self, start_logits, end_logits, context_start: int, context_length: int,
+                   window: Dict[str, Any], has_null: bool = True) -> Dict[str, Any]:
+        """Most probable answer span inside the context part of the input.
+
+        As in the transformers pipeline, the [CLS] position at index 0 (the "no answer" slot
+        of SQuAD2 models) stays in the softmax and is then dropped, so its probability mass
+        is not spread over the context tokens.
+        """
+        import torch
+        if context_length == 0:
+            return {"answer": "", "score": 0.0, "start": 0, "end": 0}
+
+        context_end = context_start + context_length
+        positions = list(range(context_start, context_end))
+        if has_null:
+            positions = [0] + positions
+        positions = torch.tensor(positions, dtype=torch.long, device=start_logits.device)
+        start_probs = torch.softmax(start_logits[positions].float().cpu(), dim=-1)
+        end_probs = torch.softmax(end_logits[positions].float().cpu(), dim=-1)
+        if has_null:
+            start_probs, end_probs = start_probs[1:], end_probs[1:]
+
+        # Score every (start, end) pair with start <= end < start + max_answer_length
+        scores = torch.outer(start_probs, end_probs)
+        scores = torch.triu(scores) - torch.triu(scores, diagonal=self.max_answer_length)
+        best = int(torch.argmax(scores))
+        start_idx, end_idx = divmod(best, context_length)
 
+        char_start = window["offsets"][start_idx][0]
+        char_end = window["offsets"][end_idx][1]
         return {
-            "answer": answer,
-            "score": confidence,
-            "start": int(start_idx),
-            "end": int(end_idx)
+            "answer": window["text"][char_start:char_end].strip(),
+            "score": float(scores[start_idx, end_idx]),
+            "start": char_start,
+            "end": char_end
         }
@@ -0,0 +1,91 @@
+import logging
+import math
+import re
+import sys
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class BM25Index:
+    """Sparse BM25 index over document chunks used to pre-filter reader input"""
+
+    TOKEN_PATTERN = re.compile(r"\w+")
+    STOP_WORDS = {
+        "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it",
+        "many", "much", "of", "on", "or", "the", "to", "was", "were", "what", "which", "who", "with"
+    }
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.logger = logging.getLogger(__name__)
+        self.k1 = k1
+        self.b = b
+        self.chunks: List[str] = []
+        self.doc_lengths: List[int] = []
+        self.avg_doc_length = 0.0
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)  # term -> [(chunk id, tf)]
+        self.idf: Dict[str, float] = {}
+
+    def tokenize(self, text: str) -> List[str]:
+        """Lowercase word tokens without stop words, with plural 's' stripped"""
+        tokens = []
+        for token in self.TOKEN_PATTERN.findall(text.lower()):
+            if token in self.STOP_WORDS:
+                continue
+            if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+                token = token[:-1]
+            tokens.append(token)
+        return tokens
+
+    def build(self, chunks: List[str]) -> None:
+        """Build the index from a list of chunks"""
+        self.chunks = list(chunks)
+        self.doc_lengths = []
+        self.postings = defaultdict(list)
+
+        for chunk_id, chunk in enumerate(self.chunks):
+            tokens = self.tokenize(chunk)
+            self.doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                self.postings[term].append((chunk_id, tf))
+
+        doc_count = len(self.chunks)
+        self.avg_doc_length = sum(self.doc_lengths) / doc_count if doc_count else 0.0
+        self.idf = {
+            term: math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+        self.logger.debug(f"Built BM25 index over {doc_count} chunks, {len(self.idf)} terms")
+
+    def search(self, query: str, top_k: int = 5, allowed: Optional[Set[int]] = None) -> List[Tuple[int, float]]:
+        """Return (chunk id, score) pairs of the top_k chunks for the query, optionally only among allowed ids"""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(self.tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for chunk_id, tf in self.postings[term]:
+                if allowed is not None and chunk_id not in allowed:
+                    continue
+                norm = 1 - self.b + self.b * self.doc_lengths[chunk_id] / (self.avg_doc_length or 1.0)
+                scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:top_k]
+
+    def top_chunks(self, query: str, top_k: int = 5, allowed: Optional[Set[int]] = None) -> List[str]:
+        """Return the text of the top_k chunks for the query, falling back to the first chunks"""
+        hits = self.search(query, top_k, allowed)
+        if not hits:
+            return self.chunks[:top_k]
+        return [self.chunks[chunk_id] for chunk_id, _ in hits]
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the index, excluding the chunk strings it shares"""
+        size = sys.getsizeof(self.postings) + sys.getsizeof(self.idf) + sys.getsizeof(self.doc_lengths)
+        for term, docs in self.postings.items():
+            # Each posting is a (chunk id, tf) tuple of two small ints
+            size += sys.getsizeof(term) + sys.getsizeof(docs) + len(docs) * 64
+        return size
+
+    def __len__(self) -> int:
+        return len(self.chunks)
@@ -0,0 +1,185 @@
+import logging
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+
+@dataclass
+class TableRow:
+    header: str
+    values: dict  # year -> value mapping
+    unit: Optional[str] = None
+
+
+@dataclass
+class TableFact:
+    metric: str
+    period: str
+    value: float
+    raw_value: str
+    unit: Optional[str] = None
+    confidence: float = 1.0  # How well the metric name matched the question
+
+
+class TableStore:
+    """Typed metric x period store built from parsed table rows, for direct KPI lookups"""
+
+    PERIOD_PATTERN = re.compile(r"\b(?:19|20)\d{2}\b")
+    NUMBER_PATTERN = re.compile(r"^\(?[-−–]?\s*\d[\d\s.,]*\)?\s*%?$")
+    WORD_PATTERN = re.compile(r"[a-z0-9]+")
+    UNIT_PATTERN = re.compile(r"[a-z0-9]+|%")
+    UNIT_WORDS = {
+        "sek", "eur", "usd", "msek", "tsek", "ksek", "thousand", "thousands", "million", "millions",
+        "billion", "tonnes", "tons", "tco2e", "co2e", "mwh", "kwh", "gwh", "percent", "%"
+    }
+    # Normalized words, so "does" appears as "doe"
+    QUESTION_WORDS = {
+        "what", "is", "was", "were", "the", "how", "many", "much", "in", "for", "of", "a", "an", "number",
+        "did", "do", "doe", "we", "our", "us", "to", "and", "by", "during", "year", "which", "are", "there"
+    }
+
+    def __init__(self, min_coverage: float = 0.6, min_words: int = 3):
+        self.logger = logging.getLogger(__name__)
+        # A metric answers a question only if its words cover this share of the question's
+        # content words, or it is at least min_words long; otherwise the reader model decides
+        self.min_coverage = min_coverage
+        self.min_words = min_words
+        self.rows: List[TableRow] = []
+        # Columnar fact storage
+        self.metrics: List[str] = []
+        self.periods: List[str] = []
+        self.values: List[float] = []
+        self.raw_values: List[str] = []
+        self.units: List[Optional[str]] = []
+        # normalized metric name -> fact ids, and token -> normalized metric names
+        self.metric_index: Dict[str, List[int]] = defaultdict(list)
+        self.token_index: Dict[str, Set[str]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def normalize(self, text: str) -> str:
+        """Lowercase words with plural 's' stripped, so 'employees' matches 'employee'"""
+        words = []
+        for word in self.WORD_PATTERN.findall(text.lower()):
+            if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+                word = word[:-1]
+            words.append(word)
+        return " ".join(words)
+
+    def parse_number(self, text: str) -> Optional[float]:
+        """Parse numbers like '1 234', '1,234.5', '1.234.567', '1.234,5', '12,5', '(340)' and '4%'"""
+        text = text.strip()
+        if not text or not self.NUMBER_PATTERN.match(text):
+            return None
+
+        negative = text.startswith("(") and text.endswith(")") or text.lstrip("(").startswith(("-", "−", "–"))
+        digits = re.sub(r"[^\d.,]", "", text)
+        if "," in digits and "." in digits:
+            # Whichever separator comes last is the decimal mark
+            if digits.rfind(",") > digits.rfind("."):
+                digits = digits.replace(".", "").replace(",", ".")
+            else:
+                digits = digits.replace(",", "")
+        elif digits.count(".") > 1:
+            digits = digits.replace(".", "")  # European thousands: 1.234.567
+        elif "," in digits:
+            # A single comma followed by 1-2 digits is a decimal comma, otherwise a thousands separator
+            head, _, tail = digits.rpartition(",")
+            digits = f"{head.replace(',', '')}.{tail}" if len(tail) <= 2 else digits.replace(",", "")
+        try:
+            value = float(digits)
+        except ValueError:
+            return None
+        return -value if negative else value
+
+    def split_unit(self, metric: str) -> tuple:
+        """Split 'Net sales, SEK thousands' into ('Net sales', 'SEK thousands')"""
+        name, _, tail = metric.rpartition(",")
+        if name and any(word in self.UNIT_WORDS for word in self.UNIT_PATTERN.findall(tail.lower())):
+            return name.strip(), tail.strip()
+        return metric.strip(), None
+
+    def build(self, table_rows: List[Dict[str, str]]) -> None:
+        """Build the store from header -> value dicts produced by TableProcessor"""
+        for row in table_rows:
+            if not row:
+                continue
+            items = list(row.items())
+            # The first column of a row holds the metric name
+            metric = items[0][1]
+            if not metric:
+                continue
+
+            name, unit = self.split_unit(metric)
+            values = {}
+            for header, raw in items[1:]:
+                period = self.PERIOD_PATTERN.search(header or "")
+                value = self.parse_number(raw or "")
+                if not period or value is None:
+                    continue
+                values[period.group()] = raw
+                if raw.strip().endswith("%"):
+                    unit = unit or "%"
+                self._add_fact(name, metric, period.group(), value, raw, unit)
+
+            if values:
+                self.rows.append(TableRow(header=metric, values=values, unit=unit))
+
+        self.logger.debug(f"Table store holds {len(self.values)} facts for {len(self.metric_index)} metrics")
+
+    def _add_fact(self, name: str, metric: str, period: str, value: float, raw: str, unit: Optional[str]) -> None:
+        fact_id = len(self.values)
+        self.metrics.append(metric)
+        self.periods.append(period)
+        self.values.append(value)
+        self.raw_values.append(raw)
+        self.units.append(unit)
+
+        for key in {self.normalize(name), self.normalize(metric)}:
+            if not key:
+                continue
+            self.metric_index[key].append(fact_id)
+            for token in key.split():
+                self.token_index[token].add(key)
+
+    def fact(self, fact_id: int) -> TableFact:
+        return TableFact(self.metrics[fact_id], self.periods[fact_id], self.values[fact_id],
+                         self.raw_values[fact_id], self.units[fact_id])
+
+    def lookup(self, question: str) -> Optional[TableFact]:
+        """Resolve a metric/period question to a fact, or None when it is not a table lookup.
+
+        The fact's confidence is the share of the question's content words covered by the metric.
+        """
+        normalized = self.normalize(question)
+        tokens = set(normalized.split())
+        content = tokens - self.QUESTION_WORDS - set(self.PERIOD_PATTERN.findall(question))
+        if not content:
+            return None
+
+        # Candidate metrics are those sharing a token with the question; all their content words must appear in it
+        candidates = set()
+        for token in content:
+            candidates.update(self.token_index.get(token, ()))
+        matches = [key for key in candidates if set(key.split()) - self.QUESTION_WORDS <= tokens]
+        if not matches:
+            return None
+        best_key = max(matches, key=lambda key: len(set(key.split()) & content))
+        matched = len(set(best_key.split()) & content)
+        coverage = matched / len(content)
+        if coverage < self.min_coverage and matched < self.min_words:
+            return None
+
+        fact_ids = self.metric_index[best_key]
+        period = self.PERIOD_PATTERN.search(question)
+        if period:
+            fact_ids = [fact_id for fact_id in fact_ids if self.periods[fact_id] == period.group()]
+        if not fact_ids:
+            return None
+
+        # Without an explicit period, answer with the most recent one
+        fact = self.fact(max(fact_ids, key=lambda fact_id: self.periods[fact_id]))
+        fact.confidence = round(coverage, 3)
+        return fact
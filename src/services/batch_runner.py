@@ -0,0 +1,326 @@
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from ..core.instrumentation import LogSink, configure_instrumentation, get_instrumentation
+from ..core.qa_model import DEFAULT_MODEL_NAME
+from .qa_service import QAService
+
+# One extraction-only QAService per worker process, created by the pool initializer
+_worker_service: Optional[QAService] = None
+
+
+def _init_worker(service_options: Dict[str, Any]) -> None:
+    global _worker_service
+    _worker_service = QAService(memoize=False, **service_options)
+
+
+def _extract_worker(pdf_path: str) -> Dict[str, Any]:
+    """Extract a document in a worker process; the model itself is never loaded here"""
+    return _worker_service.extract_document(pdf_path)
+
+
+def iter_documents(source: str) -> Iterator[Tuple[str, str]]:
+    """Yield (document_id, pdf_path) pairs from a directory tree or a manifest file.
+
+    A manifest is either a text file with one path per line or a JSONL file with
+    "pdf_path" and optional "document_id" fields. Directories are walked lazily in
+    sorted order and documents are identified by their path relative to the directory.
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(".pdf"):
+                    path = os.path.join(root, name)
+                    yield os.path.relpath(path, source), path
+        return
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+                pdf_path = entry["pdf_path"]
+                document_id = entry.get("document_id", pdf_path)
+            else:
+                pdf_path = document_id = line
+            yield document_id, pdf_path if os.path.isabs(pdf_path) else os.path.join(base_dir, pdf_path)
+
+
+def load_questions(path: str) -> List[str]:
+    """Questions from a JSON list or a text file with one question per line"""
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    if content.lstrip().startswith("["):
+        return [str(question) for question in json.loads(content)]
+    return [line.strip() for line in content.splitlines() if line.strip()]
+
+
+class Checkpoint:
+    """Append-only record of finished documents, so an interrupted run can resume"""
+
+    def __init__(self, path: str):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.done: Set[str] = set()
+        self.failed: Dict[str, str] = {}
+        if os.path.exists(path):
+            self._load()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _load(self) -> None:
+        complete_bytes = 0  # Bytes up to the last newline; anything after is a crash's partial write
+        with open(self.path, "rb") as f:
+            for raw_line in f:
+                if not raw_line.endswith(b"\n"):
+                    break
+                complete_bytes += len(raw_line)
+                try:
+                    entry = json.loads(raw_line)
+                except ValueError:
+                    continue
+                if entry["status"] == "done":
+                    self.done.add(entry["document_id"])
+                    self.failed.pop(entry["document_id"], None)
+                else:
+                    self.failed[entry["document_id"]] = entry.get("error", "")
+        if os.path.getsize(self.path) > complete_bytes:
+            # Drop the partial line so new entries do not get appended onto it
+            self.logger.warning(f"Truncating a partially written entry in {self.path}")
+            with open(self.path, "r+b") as f:
+                f.truncate(complete_bytes)
+        self.logger.info(f"Resuming: {len(self.done)} documents done, {len(self.failed)} failed")
+
+    def mark(self, document_ids: List[str], status: str = "done", error: str = "") -> None:
+        for document_id in document_ids:
+            entry = {"document_id": document_id, "status": status, "time": time.time()}
+            if error:
+                entry["error"] = error
+            self._file.write(json.dumps(entry) + "\n")
+            if status == "done":
+                self.done.add(document_id)
+            else:
+                self.failed[document_id] = error
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class JSONLResultWriter:
+    """Appends one JSON line per answer; every write is durable before it is checkpointed"""
+
+    def __init__(self, path: str):
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, document_id: str, rows: List[Dict[str, Any]]) -> List[str]:
+        """Write a document's rows and return the document ids that are now safely stored"""
+        for row in rows:
+            self._file.write(json.dumps(row) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return [document_id]
+
+    def flush(self) -> List[str]:
+        return []
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetResultWriter:
+    """Buffers rows and writes them as numbered part files in an output directory.
+
+    Parquet files cannot be appended to, so each flush writes a new part and a resumed
+    run simply adds more parts next to the existing ones.
+    """
+
+    def __init__(self, output_dir: str, rows_per_file: int = 50000):
+        try:
+            import pandas  # noqa: F401
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise Exception("Parquet output requires pandas and pyarrow to be installed")
+        self.output_dir = output_dir
+        self.rows_per_file = rows_per_file
+        self.rows: List[Dict[str, Any]] = []
+        self.pending_ids: List[str] = []
+        self.run_id = time.strftime("%Y%m%d-%H%M%S")
+        self.parts_written = 0
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, document_id: str, rows: List[Dict[str, Any]]) -> List[str]:
+        self.rows.extend(rows)
+        self.pending_ids.append(document_id)
+        if len(self.rows) >= self.rows_per_file:
+            return self.flush()
+        return []
+
+    def flush(self) -> List[str]:
+        if not self.pending_ids:
+            return []
+        import pandas as pd
+
+        self.parts_written += 1
+        path = os.path.join(self.output_dir, f"part-{self.run_id}-{self.parts_written:05d}.parquet")
+        pd.DataFrame(self.rows).to_parquet(path + ".tmp", engine="pyarrow", index=False)
+        os.replace(path + ".tmp", path)
+        written, self.rows, self.pending_ids = self.pending_ids, [], []
+        return written
+
+    def close(self) -> None:
+        self.flush()
+
+
+class BatchRunner:
+    """Answers a question set for every PDF in a corpus.
+
+    Extraction runs in a process pool while the main process answers questions with one
+    shared, batched model. At most max_in_flight documents are extracted or held in memory
+    at any time, whatever the corpus size.
+    """
+
+    def __init__(self, qa_service: QAService, questions: List[str], writer, checkpoint: Checkpoint,
+                 workers: int = 4, max_in_flight: Optional[int] = None, confidence_threshold: float = 0.5,
+                 service_options: Optional[Dict[str, Any]] = None, retry_failed: bool = False):
+        self.logger = logging.getLogger(__name__)
+        self.qa_service = qa_service
+        self.questions = questions
+        self.writer = writer
+        self.checkpoint = checkpoint
+        self.workers = workers
+        self.max_in_flight = max_in_flight or workers * 2
+        self.confidence_threshold = confidence_threshold
+        self.service_options = service_options or {}
+        self.retry_failed = retry_failed
+        self.processed = 0
+        self.failed = 0
+        self.skipped = 0
+
+    def _pending_documents(self, documents: Iterator[Tuple[str, str]]) -> Iterator[Tuple[str, str]]:
+        for document_id, pdf_path in documents:
+            if document_id in self.checkpoint.done or (document_id in self.checkpoint.failed and not self.retry_failed):
+                self.skipped += 1
+                continue
+            yield document_id, pdf_path
+
+    def run(self, documents: Iterator[Tuple[str, str]]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        pending = self._pending_documents(documents)
+        in_flight: Dict[Future, Tuple[str, str]] = {}
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.service_options,)) as executor:
+            try:
+                self._fill(executor, pending, in_flight)
+                while in_flight:
+                    finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        document_id, pdf_path = in_flight.pop(future)
+                        self._answer_document(document_id, pdf_path, future)
+                    # Refill only after answering, so finished states are not queued up unboundedly
+                    self._fill(executor, pending, in_flight)
+            finally:
+                self.checkpoint.mark(self.writer.flush())
+
+        summary = {
+            "processed": self.processed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "seconds": time.perf_counter() - start
+        }
+        self.logger.info(f"Batch finished: {summary}")
+        return summary
+
+    def _fill(self, executor: ProcessPoolExecutor, pending: Iterator[Tuple[str, str]],
+              in_flight: Dict[Future, Tuple[str, str]]) -> None:
+        while len(in_flight) < self.max_in_flight:
+            document = next(pending, None)
+            if document is None:
+                return
+            in_flight[executor.submit(_extract_worker, document[1])] = document
+
+    def _answer_document(self, document_id: str, pdf_path: str, future: Future) -> None:
+        try:
+            state = future.result()
+            self.qa_service.load_document_state(state)
+            self.qa_service.build_retrieval_indexes()
+            answers = self.qa_service.get_answers(self.questions, self.confidence_threshold)
+        except Exception as e:
+            self.logger.error(f"Error processing {document_id}: {str(e)}")
+            self.failed += 1
+            self.checkpoint.mark([document_id], status="failed", error=str(e))
+            return
+
+        rows = [{"document_id": document_id, "pdf_path": pdf_path, "page": None, **answer} for answer in answers]
+        self.checkpoint.mark(self.writer.write(document_id, rows))
+        self.processed += 1
+        get_instrumentation().increment("batch_documents")
+        if self.processed % 100 == 0:
+            self.logger.info(f"{self.processed} documents processed, {self.failed} failed, {self.skipped} skipped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a question set for every PDF in a directory or manifest")
+    parser.add_argument("source", help="Directory of PDFs, or a manifest (one path per line, or JSONL)")
+    parser.add_argument("questions", help="Question file: one question per line, or a JSON list")
+    parser.add_argument("--output", required=True, help="JSONL file, or a directory for --format parquet")
+    parser.add_argument("--format", choices=("jsonl", "parquet"), default="jsonl")
+    parser.add_argument("--checkpoint", default=None, help="Defaults to <output>.checkpoint.jsonl")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Extraction processes")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="Documents extracted or held at once (default: 2 x workers)")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--confidence-threshold", type=float, default=0.5)
+    parser.add_argument("--enable-ocr", action="store_true")
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry documents that failed in earlier runs")
+    parser.add_argument("--small-model", default=None,
+                        help="Fast reader that answers first; only unsure questions reach the default model")
+    parser.add_argument("--escalate-below", type=float, default=0.5,
+                        help="Small reader confidence below which a question is re-read by the default model")
+    parser.add_argument("--escalate-chunks", type=int, default=2, help="Best chunks re-read per escalated question")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    configure_instrumentation([LogSink()])
+
+    service_options = {"enable_ocr": args.enable_ocr, "cache_dir": args.cache_dir, "backend": args.backend}
+    reader_tiers = None
+    if args.small_model:
+        reader_tiers = [
+            {"model_name": args.small_model, "escalate_below": args.escalate_below,
+             "escalate_chunks": args.escalate_chunks},
+            {"model_name": DEFAULT_MODEL_NAME}
+        ]
+    qa_service = QAService(batch_size=args.batch_size, reader_tiers=reader_tiers, **service_options)
+    if args.format == "parquet":
+        writer = ParquetResultWriter(args.output)
+    else:
+        writer = JSONLResultWriter(args.output)
+    checkpoint = Checkpoint(args.checkpoint or args.output.rstrip("/") + ".checkpoint.jsonl")
+
+    runner = BatchRunner(qa_service, load_questions(args.questions), writer, checkpoint, args.workers,
+                         args.max_in_flight, args.confidence_threshold, service_options, args.retry_failed)
+    try:
+        runner.run(iter_documents(args.source))
+    finally:
+        writer.close()
+        checkpoint.close()
+        get_instrumentation().emit()
+        if reader_tiers:
+            logging.getLogger(__name__).info(f"Reader tiers: {json.dumps(qa_service.reader_report())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import argparse
+import json
+import logging
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..core.corpus_index import CorpusIndex
+from ..core.document_map import DocumentMap
+from ..core.instrumentation import LogSink, configure_instrumentation, get_instrumentation
+from .batch_runner import iter_documents
+from .qa_service import QAService
+
+
+class CorpusService:
+    """Cross-document question answering over a persistent CorpusIndex.
+
+    Documents are extracted and embedded once at ingestion. A question is embedded,
+    the index returns the nearest chunks from the whole corpus and only those chunks
+    are read by the QA model.
+    """
+
+    def __init__(self, qa_service: QAService, index_dir: str, nlist: int = 256, nprobe: int = 8,
+                 embed_batch_size: int = 16):
+        self.logger = logging.getLogger(__name__)
+        if qa_service.qa_model.backend == "onnx":
+            raise ValueError("Corpus embeddings need the transformer encoder, which the onnx backend "
+                             "does not expose; use the torch backend")
+        self.qa_service = qa_service
+        self.index = CorpusIndex(index_dir, nlist=nlist, nprobe=nprobe)
+        self.embed_batch_size = embed_batch_size
+
+    def ingest(self, document_id: str, pdf_path: str) -> int:
+        """Extract, embed and index a document; returns the number of chunks added"""
+        if self.index.has_document(document_id):
+            self.logger.debug(f"Already indexed: {document_id}")
+            return 0
+        state = self.qa_service.extract_document(pdf_path)
+        document_map = DocumentMap.from_dict(state.get("document_map") or {})
+
+        chunks = []
+        for context_type, windows in state.get("windows", {}).items():
+            for window in windows:
+                if not window["text"].strip():
+                    continue
+                # Only text windows have offsets into the page-aligned document text
+                page = document_map.page_at(window.get("start", 0)) if context_type == "text" else None
+                chunks.append({"text": window["text"], "page": page, "start": window.get("start", 0)})
+
+        with get_instrumentation().timer("corpus_embed"):
+            embeddings = self.qa_service.qa_model.embed_texts([chunk["text"] for chunk in chunks],
+                                                              self.embed_batch_size)
+        self.index.add(document_id, chunks, embeddings)
+        get_instrumentation().increment("corpus_documents_indexed")
+        return len(chunks)
+
+    def ingest_all(self, documents: Iterator[Tuple[str, str]]) -> Dict[str, int]:
+        added = failed = 0
+        for document_id, pdf_path in documents:
+            try:
+                if self.ingest(document_id, pdf_path):
+                    added += 1
+            except Exception as e:
+                self.logger.error(f"Error ingesting {document_id}: {str(e)}")
+                failed += 1
+        return {"added": added, "failed": failed, "documents": len(self.index.document_ids), "chunks": len(self.index)}
+
+    def ask(self, question: str, top_k: int = 50, max_per_document: Optional[int] = 1,
+            confidence_threshold: float = 0.0, nprobe: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Best answer per document for one question, from the top_k nearest chunks in the corpus"""
+        instrumentation = get_instrumentation()
+        with instrumentation.timer("corpus_search"):
+            query = self.qa_service.qa_model.embed_texts([question])[0]
+            hits = self.index.search(query, top_k, nprobe, max_per_document)
+        if not hits:
+            return []
+
+        qa_model = self.qa_service.qa_model
+        pairs = [(hit, window) for hit in hits for window in qa_model.make_windows(hit["text"])[:1]]
+        results = qa_model.score_windows([question] * len(pairs), [window for _, window in pairs],
+                                         self.qa_service.batch_size)
+
+        best: Dict[str, Dict[str, Any]] = {}
+        for (hit, _), result in zip(pairs, results):
+            if not result["answer"] or result["score"] < confidence_threshold:
+                continue
+            current = best.get(hit["document_id"])
+            if current is None or result["score"] > current["confidence"]:
+                best[hit["document_id"]] = {
+                    "document_id": hit["document_id"],
+                    "question": question,
+                    "answer": result["answer"],
+                    "confidence": result["score"],
+                    "page": hit["page"],
+                    "retrieval_score": hit["score"]
+                }
+        return sorted(best.values(), key=lambda answer: answer["confidence"], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query a corpus-wide vector index of PDFs")
+    parser.add_argument("index_dir", help="Directory holding the corpus index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = subparsers.add_parser("ingest", help="Add documents to the index")
+    ingest_parser.add_argument("source", help="Directory of PDFs, or a manifest (one path per line, or JSONL)")
+    ingest_parser.add_argument("--nlist", type=int, default=256, help="IVF lists, used when the index is trained")
+    ingest_parser.add_argument("--enable-ocr", action="store_true")
+    ingest_parser.add_argument("--cache-dir", default=None)
+    ask_parser = subparsers.add_parser("ask", help="Answer a question across every indexed document")
+    ask_parser.add_argument("question")
+    ask_parser.add_argument("--top-k", type=int, default=50)
+    ask_parser.add_argument("--nprobe", type=int, default=8)
+    ask_parser.add_argument("--max-per-document", type=int, default=1)
+    ask_parser.add_argument("--confidence-threshold", type=float, default=0.0)
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--batch-size", type=int, default=16)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    configure_instrumentation([LogSink()])
+
+    if args.command == "ingest":
+        qa_service = QAService(enable_ocr=args.enable_ocr, cache_dir=args.cache_dir, backend=args.backend,
+                               batch_size=args.batch_size, memoize=False)
+        corpus = CorpusService(qa_service, args.index_dir, nlist=args.nlist, embed_batch_size=args.batch_size)
+        print(json.dumps(corpus.ingest_all(iter_documents(args.source))))
+    else:
+        qa_service = QAService(backend=args.backend, batch_size=args.batch_size, memoize=False)
+        corpus = CorpusService(qa_service, args.index_dir, nprobe=args.nprobe)
+        start = time.perf_counter()
+        answers = corpus.ask(args.question, args.top_k, args.max_per_document, args.confidence_threshold)
+        for answer in answers:
+            print(json.dumps(answer))
+        corpus.logger.info(f"{len(answers)} documents answered in {time.perf_counter() - start:.3f}s")
+    get_instrumentation().emit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import logging
+import sys
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+
+from ..core.context_cache import ContextEncodingCache
+from ..core.retrieval_index import BM25Index
+from .qa_service import QAService
+
+
+def estimate_size(value: Any, seen: Optional[Set[int]] = None) -> int:
+    """Approximate deep size in bytes of an extracted document state.
+
+    Objects reachable more than once, such as chunk strings shared by the windows and
+    the indexes, are counted once.
+    """
+    if seen is None:
+        seen = set()
+    if id(value) in seen or isinstance(value, logging.Logger):
+        return 0
+    seen.add(id(value))
+    if isinstance(value, BM25Index):
+        return value.memory_bytes() + estimate_size(value.chunks, seen)
+    if isinstance(value, ContextEncodingCache):
+        return value.memory_bytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k, seen) + estimate_size(v, seen) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimate_size(item, seen) for item in value)
+    if hasattr(value, "__dict__"):
+        # TableStore, DocumentMap and the like
+        return sys.getsizeof(value) + estimate_size(vars(value), seen)
+    return sys.getsizeof(value)
+
+
+def cache_bytes(state: Dict[str, Any]) -> int:
+    """Bytes held by a document's context encoding cache, which grows as questions are answered"""
+    context_cache = state.get("context_cache")
+    return context_cache.memory_bytes if context_cache is not None else 0
+
+
+class DocumentRegistry:
+    """Holds extracted and indexed documents by id under a memory budget with LRU eviction.
+
+    A document is charged for its prepared state (indexes, table store, document map and offset
+    map included) plus its context encoding cache, which is re-measured after each answer.
+    """
+
+    def __init__(self, qa_service: QAService, max_memory_bytes: int = 1024 * 1024 * 1024):
+        self.logger = logging.getLogger(__name__)
+        self.qa_service = qa_service
+        self.max_memory_bytes = max_memory_bytes
+        self.documents: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.sizes: Dict[str, int] = {}
+        self.base_sizes: Dict[str, int] = {}  # Size without the context encoding cache
+        self.memory_bytes = 0
+        self.evictions = 0
+
+    def __contains__(self, document_id: str) -> bool:
+        return document_id in self.documents
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def get(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Return a document's state and mark it as most recently used"""
+        state = self.documents.get(document_id)
+        if state is not None:
+            self.documents.move_to_end(document_id)
+        return state
+
+    def put(self, document_id: str, state: Dict[str, Any]) -> None:
+        """Register an extracted document, evicting least recently used ones over budget"""
+        if "indexes" not in state:
+            state["indexes"] = self.qa_service.build_indexes(state["chunks"])
+        # Measure the state as answering will hold it, not just as extracted
+        self.qa_service.prepare_document_state(state)
+
+        self.remove(document_id)
+        size = estimate_size(state)
+        self.documents[document_id] = state
+        self.sizes[document_id] = size
+        self.base_sizes[document_id] = size - cache_bytes(state)
+        self.memory_bytes += size
+        self._evict(keep=document_id)
+
+    def load(self, document_id: str, pdf_path: str) -> Dict[str, Any]:
+        """Return a registered document, extracting it first if needed"""
+        state = self.get(document_id)
+        if state is None:
+            state = self.qa_service.extract_document(pdf_path)
+            self.put(document_id, state)
+        return state
+
+    def remove(self, document_id: str) -> None:
+        if document_id in self.documents:
+            del self.documents[document_id]
+            self.memory_bytes -= self.sizes.pop(document_id)
+            del self.base_sizes[document_id]
+
+    def refresh(self, document_id: str) -> None:
+        """Re-measure a document after its caches grew, evicting other documents if now over budget"""
+        state = self.documents.get(document_id)
+        if state is None:
+            return
+        size = self.base_sizes[document_id] + cache_bytes(state)
+        self.memory_bytes += size - self.sizes[document_id]
+        self.sizes[document_id] = size
+        self._evict(keep=document_id)
+
+    def _evict(self, keep: str) -> None:
+        while self.memory_bytes > self.max_memory_bytes and len(self.documents) > 1:
+            document_id = next(iter(self.documents))
+            if document_id == keep:
+                break
+            self.remove(document_id)
+            self.evictions += 1
+            self.logger.debug(f"Evicted document {document_id}, {self.memory_bytes} bytes in use")
+
+    def answer(self, document_id: str, questions: List[str],
+               confidence_threshold: float = 0.5) -> List[Dict[str, Any]]:
+        """Answer questions against one registered document"""
+        state = self.get(document_id)
+        if state is None:
+            raise KeyError(f"Document not registered: {document_id}")
+
+        self.qa_service.load_document_state(state)
+        answers = self.qa_service.get_answers(questions, confidence_threshold)
+        self.refresh(document_id)
+        return answers
+
+    def answer_many(self, document_ids: List[str], questions: List[str],
+                    confidence_threshold: float = 0.5) -> Dict[str, List[Dict[str, Any]]]:
+        """Answer the same questions against several registered documents"""
+        return {
+            document_id: self.answer(document_id, questions, confidence_threshold)
+            for document_id in document_ids
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "documents": len(self.documents),
+            "memory_bytes": self.memory_bytes,
+            "max_memory_bytes": self.max_memory_bytes,
+            "evictions": self.evictions
+        }
@@ -0,0 +1,336 @@
+import argparse
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..core.instrumentation import (JSONSink, LogSink, PrometheusSink, configure_instrumentation,
+                                    get_instrumentation)
+from .document_registry import DocumentRegistry
+from .qa_service import QAService
+
+
+class MicroBatcher:
+    """Merges (question, context) pairs from concurrent requests into model batches"""
+
+    def __init__(self, qa_service: QAService, max_batch_size: int = 32, max_wait_ms: float = 10.0):
+        self.logger = logging.getLogger(__name__)
+        self.qa_service = qa_service
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.queue: Optional[asyncio.Queue] = None
+        self.model_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="qa-model")
+        self.batch_sizes = deque(maxlen=1000)
+        self.batch_latencies_ms = deque(maxlen=1000)
+        self.batches_run = 0
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self.queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker:
+            self._worker.cancel()
+        self.model_executor.shutdown(wait=False)
+
+    async def submit(self, pairs: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Queue (question, window) pairs for the next batches and wait for their results"""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for question, window in pairs:
+            future = loop.create_future()
+            await self.queue.put((question, window, future))
+            futures.append(future)
+        return await asyncio.gather(*futures)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait_ms / 1000
+            while len(items) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            questions = [question for question, _, _ in items]
+            windows = [window for _, window, _ in items]
+            contexts = [window["text"] for window in windows]
+            start = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(
+                    self.model_executor, self.qa_service.run_qa_batch, questions, contexts, windows
+                )
+                for (_, _, future), result in zip(items, results):
+                    if not future.done():
+                        future.set_result(result)
+            except Exception as e:
+                self.logger.error(f"Error running batch: {str(e)}")
+                for _, _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+
+            self.batches_run += 1
+            self.batch_sizes.append(len(items))
+            self.batch_latencies_ms.append((time.perf_counter() - start) * 1000)
+
+
+class QAServer:
+    """Long-running asyncio HTTP service that keeps one QA model in memory"""
+
+    def __init__(self, qa_service: QAService, max_batch_size: int = 32, max_wait_ms: float = 10.0,
+                 max_memory_bytes: int = 1024 * 1024 * 1024, metrics_interval: float = 60.0,
+                 request_workers: int = 8):
+        self.logger = logging.getLogger(__name__)
+        self.qa_service = qa_service
+        self.batcher = MicroBatcher(qa_service, max_batch_size, max_wait_ms)
+        self.extract_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="qa-extract")
+        # Answer selection runs here; its model work is queued on the batcher, so these threads mostly wait
+        self.request_executor = ThreadPoolExecutor(max_workers=request_workers, thread_name_prefix="qa-request")
+        # Profiled requests run one at a time, each entirely inside this thread
+        self.profile_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="qa-profile")
+        self.documents = DocumentRegistry(qa_service, max_memory_bytes)
+        self._loading: Dict[str, asyncio.Task] = {}  # document id -> in-flight extraction
+        self.request_latencies_ms = deque(maxlen=1000)
+        self.requests_served = 0
+        self.metrics_interval = metrics_interval  # Seconds between instrumentation sink emits
+        self.prometheus = PrometheusSink()
+
+    async def load_document(self, document_id: str, pdf_path: str) -> Dict[str, Any]:
+        """Extract a document off the event loop and keep it for later questions"""
+        state = self.documents.get(document_id)
+        if state is not None:
+            return state
+
+        # Concurrent requests for the same document share one extraction
+        if document_id not in self._loading:
+            self._loading[document_id] = asyncio.create_task(self._extract(pdf_path))
+        try:
+            state = await self._loading[document_id]
+        finally:
+            self._loading.pop(document_id, None)
+        self.documents.put(document_id, state)
+        return state
+
+    async def _extract(self, pdf_path: str) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.extract_executor, self.qa_service.extract_document, pdf_path)
+
+    async def answer(self, document_id: str, pdf_path: str, questions: List[str],
+                     confidence_threshold: float = 0.5) -> List[Dict[str, Any]]:
+        """Answer questions against a document, sharing model batches with other requests.
+
+        Answers go through QAService's selection (memoized answers, the table store, the
+        source cascade and section routing) in a request thread, with the micro-batcher
+        scoring its windows.
+        """
+        state = await self.load_document(document_id, pdf_path)
+        loop = asyncio.get_running_loop()
+        answers = await loop.run_in_executor(
+            self.request_executor, self._answer_state, state, questions, confidence_threshold, loop
+        )
+        self.documents.refresh(document_id)
+        return answers
+
+    def _answer_state(self, state: Dict[str, Any], questions: List[str], confidence_threshold: float,
+                      loop: asyncio.AbstractEventLoop) -> List[Dict[str, Any]]:
+        def score_with_batcher(batch_questions: List[str], windows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            pairs = list(zip(batch_questions, windows))
+            return asyncio.run_coroutine_threadsafe(self.batcher.submit(pairs), loop).result()
+
+        qa_service = self.qa_service.view(score_with_batcher)
+        qa_service.load_document_state(state)
+        return qa_service.get_answers(questions, confidence_threshold)
+
+    async def answer_profiled(self, document_id: str, pdf_path: str, questions: List[str],
+                              confidence_threshold: float, mode: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Answer like answer() with the whole request profiled.
+
+        Profilers only see the thread they run in, so extraction (for a new document), answer
+        selection and the model passes all run in the profile thread; the model is called
+        directly rather than through the micro-batcher.
+        """
+        loop = asyncio.get_running_loop()
+        state = self.documents.get(document_id)
+        state, answers, profile = await loop.run_in_executor(
+            self.profile_executor, self._answer_profiled, state, pdf_path, questions, confidence_threshold, mode
+        )
+        if document_id not in self.documents:
+            self.documents.put(document_id, state)
+        self.documents.refresh(document_id)
+        return answers, profile
+
+    def _answer_profiled(self, state: Optional[Dict[str, Any]], pdf_path: str, questions: List[str],
+                         confidence_threshold: float,
+                         mode: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]], Dict[str, Any]]:
+        qa_service = self.qa_service.view()
+        with get_instrumentation().capture(mode) as profile:
+            if state is None:
+                state = qa_service.extract_document(pdf_path)
+                state["indexes"] = qa_service.build_indexes(state["chunks"])
+            qa_service.load_document_state(state)
+            answers = qa_service.get_answers(questions, confidence_threshold)
+        return state, answers, profile
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, batch size and latency metrics"""
+        batch_sizes = list(self.batcher.batch_sizes)
+        return {
+            "queue_depth": self.batcher.queue.qsize() if self.batcher.queue else 0,
+            "documents_loaded": len(self.documents),
+            "document_memory_bytes": self.documents.memory_bytes,
+            "document_evictions": self.documents.evictions,
+            "requests_served": self.requests_served,
+            "batches_run": self.batcher.batches_run,
+            "avg_batch_size": sum(batch_sizes) / len(batch_sizes) if batch_sizes else 0.0,
+            "batch_latency_ms": _percentiles(self.batcher.batch_latencies_ms),
+            "request_latency_ms": _percentiles(self.request_latencies_ms),
+            "pipeline": get_instrumentation().snapshot()
+        }
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Minimal HTTP/1.1 handler: POST /answer and GET /metrics.
+
+        GET /metrics?format=prometheus returns the pipeline instrumentation in the Prometheus
+        text format. A "profile" of "cprofile" or "tracemalloc" in an /answer request profiles
+        just that request and returns the report with the answers.
+        """
+        start = time.perf_counter()
+        content_type = "application/json"
+        try:
+            method, target, body = await _read_request(reader)
+            path, _, query = target.partition("?")
+            if method == "GET" and path == "/metrics" and "format=prometheus" in query:
+                status, payload = 200, self.prometheus.render(get_instrumentation().snapshot())
+                content_type = "text/plain; version=0.0.4"
+            elif method == "GET" and path == "/metrics":
+                status, payload = 200, self.metrics()
+            elif method == "POST" and path == "/answer":
+                request = json.loads(body or b"{}")
+                pdf_path = request["pdf_path"]
+                args = (request.get("document_id", pdf_path), pdf_path, request["questions"],
+                        request.get("confidence_threshold", 0.5))
+                if request.get("profile"):
+                    answers, profile = await self.answer_profiled(*args, request["profile"])
+                    status, payload = 200, {"answers": answers, "profile": profile}
+                else:
+                    status, payload = 200, {"answers": await self.answer(*args)}
+                self.requests_served += 1
+                self.request_latencies_ms.append((time.perf_counter() - start) * 1000)
+            else:
+                status, payload = 404, {"error": f"Unknown route {method} {path}"}
+        except (KeyError, ValueError) as e:
+            status, payload = 400, {"error": f"Bad request: {str(e)}"}
+        except Exception as e:
+            self.logger.error(f"Error handling request: {str(e)}")
+            status, payload = 500, {"error": str(e)}
+
+        data = payload.encode() if isinstance(payload, str) else json.dumps(payload).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+            f"Content-Type: {content_type}\r\nContent-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode()
+            + data
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8080, unix_socket: Optional[str] = None) -> None:
+        """Serve on a TCP port or a Unix socket until cancelled"""
+        self.batcher.start()
+        emitter = asyncio.create_task(self._emit_metrics())
+        if unix_socket:
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_socket)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        self.logger.info(f"QA server listening on {unix_socket or f'{host}:{port}'}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            emitter.cancel()
+            await self.batcher.stop()
+            self.extract_executor.shutdown(wait=False)
+            self.request_executor.shutdown(wait=False)
+            self.profile_executor.shutdown(wait=False)
+
+    async def _emit_metrics(self) -> None:
+        """Periodically push the pipeline instrumentation to the configured sinks"""
+        instrumentation = get_instrumentation()
+        while instrumentation.sinks:
+            await asyncio.sleep(self.metrics_interval)
+            instrumentation.emit()
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, bytes]:
+    request_line = (await reader.readline()).decode().split()
+    if len(request_line) < 2:
+        raise ValueError("Malformed request line")
+
+    content_length = 0
+    while True:
+        line = (await reader.readline()).decode().strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        if name.lower() == "content-length":
+            content_length = int(value.strip())
+
+    body = await reader.readexactly(content_length) if content_length else b""
+    return request_line[0].upper(), request_line[1], body
+
+
+def _percentiles(values) -> Dict[str, float]:
+    ordered = sorted(values)
+    if not ordered:
+        return {"p50": 0.0, "p95": 0.0}
+    return {
+        "p50": ordered[int(0.50 * (len(ordered) - 1))],
+        "p95": ordered[int(0.95 * (len(ordered) - 1))]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the PDF question answering server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--unix-socket", default=None)
+    parser.add_argument("--enable-ocr", action="store_true")
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=10.0)
+    parser.add_argument("--max-memory-mb", type=int, default=1024)
+    parser.add_argument("--metrics-interval", type=float, default=60.0, help="Seconds between metric sink emits")
+    parser.add_argument("--metrics-log", action="store_true", help="Log pipeline stage metrics")
+    parser.add_argument("--metrics-json", default=None, help="Append pipeline metrics as JSON lines to this file")
+    parser.add_argument("--metrics-prometheus-file", default=None,
+                        help="Write pipeline metrics in Prometheus text format to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    sinks = []
+    if args.metrics_log:
+        sinks.append(LogSink())
+    if args.metrics_json:
+        sinks.append(JSONSink(args.metrics_json))
+    if args.metrics_prometheus_file:
+        sinks.append(PrometheusSink(args.metrics_prometheus_file))
+    configure_instrumentation(sinks)
+
+    qa_service = QAService(enable_ocr=args.enable_ocr, batch_size=args.max_batch_size, cache_dir=args.cache_dir)
+    server = QAServer(qa_service, args.max_batch_size, args.max_wait_ms, args.max_memory_mb * 1024 * 1024,
+                      args.metrics_interval)
+    asyncio.run(server.serve(args.host, args.port, args.unix_socket))
+
+
+if __name__ == "__main__":
+    main()
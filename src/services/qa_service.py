@@ -1,74 +1,750 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
+from ..core.answer_cache import AnswerCache
+from ..core.context_cache import ContextEncodingCache
+from ..core.document_map import DocumentMap
+from ..core.extraction_cache import ExtractionCache
+from ..core.instrumentation import get_instrumentation
 from ..core.pdf_extractor import PDFExtractor
-from ..core.qa_model import QAModel
+from ..core.pipeline import Pipeline
+from ..core.qa_model import DEFAULT_MODEL_NAME, QAModel
+from ..core.processors.text_normalizer import OffsetMap
 from ..core.processors.text_processor import TextProcessor
+from ..core.retrieval_index import BM25Index
+from ..core.table_store import TableFact, TableStore
+import copy
+import hashlib
 import logging
 import re
-from dataclasses import dataclass
-from typing import List, Optional
-from transformers import pipeline
+import time
+from typing import Callable, List, Optional, Set
 
+# Sources tried for questions the table store cannot answer. Stages are run cheapest per
+# expected answer first; max_chunks caps windows read per question, max_ms caps a stage's model time.
+DEFAULT_CASCADE = [
+    {"context_type": "table", "max_chunks": 3, "max_ms": None, "expected_yield": 0.6},
+    {"context_type": "image", "max_chunks": 2, "max_ms": None, "expected_yield": 0.2},
+    {"context_type": "text", "max_chunks": None, "max_ms": None, "expected_yield": 0.4},
+]
 
-@dataclass
-class TableRow:
-    header: str
-    values: dict  # year -> value mapping
+# Example reader cascade: a distilled reader scores every candidate chunk and only the best
+# chunks of questions it is unsure about are re-read by the large default model
+SMALL_READER_CASCADE = [
+    {"model_name": "deepset/minilm-uncased-squad2", "escalate_below": 0.5, "escalate_chunks": 2},
+    {"model_name": DEFAULT_MODEL_NAME},
+]
 
 
 class QAService:
     """Service for question answering using transformer models"""
 
-    def __init__(self, enable_ocr: bool = False):
-        self.text_processor = None
+    def __init__(self, enable_ocr: bool = False, batch_size: int = 16, top_k: Optional[int] = 5,
+                 cache_dir: Optional[str] = None, cache_max_bytes: int = 512 * 1024 * 1024,
+                 extraction_workers: int = 1, backend: str = "torch", model_name: str = DEFAULT_MODEL_NAME,
+                 reader_mode: str = "cross", rerank_k: int = 2, memoize: bool = True,
+                 answer_cache_size: int = 1024, answer_cache_dir: Optional[str] = None,
+                 ocr_options: Optional[Dict[str, Any]] = None, cascade: Optional[List[Dict[str, Any]]] = None,
+                 route_sections: int = 3, reader_tiers: Optional[List[Dict[str, Any]]] = None,
+                 context_cache_bytes: int = 128 * 1024 * 1024):
+        self.text_processor = TextProcessor()
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.DEBUG)
 
-        self.logger.debug("Initializing QA pipeline...")
-        self.qa_pipeline = pipeline(
-            "question-answering",
-            model="deepset/bert-large-uncased-whole-word-masking-squad2",
-            device=0
-        )
+        # The model is loaded on first use and shared by every QAModel/QAService in the process
+        self.qa_model = QAModel(model_name=model_name, backend=backend)
+        self._qa_pipeline = None
 
-        self.pdf_extractor = PDFExtractor(enable_ocr=enable_ocr)
+        self.pdf_extractor = PDFExtractor(enable_ocr=enable_ocr, ocr_options=ocr_options)
+        self.text_processor.normalizer = self.pdf_extractor.normalizer  # One set of normalization rules
         self.text_content = ""
         self.table_content = ""
         self.image_content = ""
-        self.parsed_tables = []  # List of lists of TableRow
-        # self.qa_model = QAModel()
+        self.parsed_tables = []  # Header -> value dicts from TableProcessor
+        self.table_store = TableStore()
+        self.batch_size = batch_size
+        self.top_k = top_k  # None disables retrieval and reads every chunk
+        self.retrieval_indexes: Dict[str, BM25Index] = {}  # context_type -> index
+        self.chunks: Dict[str, List[str]] = {}  # context_type -> chunks
+        self.window_lookup: Dict[str, Dict[str, Any]] = {}  # chunk text -> pre-tokenized window
+        # Replaces the main model for (questions, windows) scoring, e.g. a server's micro-batcher
+        self.window_scorer: Optional[Callable[[List[str], List[Dict[str, Any]]], List[Dict[str, Any]]]] = None
+        self.context_cache_bytes = context_cache_bytes  # Per-document bound on cached window encodings
+        self.context_cache = ContextEncodingCache(context_cache_bytes)
+        # "late_interaction" reranks retrieved windows with cached encoder states before the cross reader
+        self.reader_mode = reader_mode
+        self.rerank_k = rerank_k
+        self.answer_cache = AnswerCache(answer_cache_size, answer_cache_dir) if memoize else None
+        self.document_hash = ""
+        self.cache = ExtractionCache(cache_dir, cache_max_bytes) if cache_dir else None
+        self.extraction_workers = extraction_workers  # > 1 enables page-parallel extraction
+        self.cascade = cascade or DEFAULT_CASCADE
+        # context_type -> questions attempted / answered, used to learn each stage's yield
+        self.cascade_stats: Dict[str, Dict[str, int]] = {}
+        self.pass_overhead_tokens = 256  # Fixed cost of one model pass, in tokens, for cascade planning
+        self.document_map = DocumentMap()
+        self.offset_map = OffsetMap()  # text_content offsets -> (page, offset in the page's raw text)
+        self.route_sections = route_sections  # Text retrieval is limited to this many sections; 0 disables
+        # Readers tried in order; a question moves to the next tier only when the current one is unsure
+        self.reader_tiers = reader_tiers or [{"model_name": model_name}]
+        self.reader_models = [
+            self.qa_model if tier["model_name"] == model_name
+            else QAModel(model_name=tier["model_name"], backend=backend)
+            for tier in self.reader_tiers
+        ]
+        self.reader_stats: List[Dict[str, float]] = [
+            {"groups": 0, "confident": 0, "escalated": 0, "pairs": 0, "seconds": 0.0} for _ in self.reader_tiers
+        ]
+
+    @property
+    def qa_pipeline(self):
+        """transformers question-answering pipeline over the shared model, built on first use"""
+        if self._qa_pipeline is None:
+            from transformers import pipeline
+
+            self.logger.debug(f"Initializing QA pipeline with the {self.qa_model.backend} backend...")
+            pipeline_kwargs = {}
+            if self.qa_model.pipeline_device() is not None:
+                pipeline_kwargs["device"] = self.qa_model.pipeline_device()
+            self._qa_pipeline = pipeline(
+                "question-answering",
+                model=self.qa_model.model,
+                tokenizer=self.qa_model.tokenizer,
+                **pipeline_kwargs
+            )
+        return self._qa_pipeline
+
+    @qa_pipeline.setter
+    def qa_pipeline(self, qa_pipeline) -> None:
+        self._qa_pipeline = qa_pipeline
 
     def initialize(self, pdf_path: str) -> None:
         """Initialize the service with a PDF file"""
         try:
-            self.logger.debug(f"Loading PDF from: {pdf_path}")
-            self.pdf_extractor.load_pdf(pdf_path)
-            self.text_processor = TextProcessor()
-            # self.logger.debug("Extracting text content...")
-            self.text_content = self.text_processor.clean_text(self.pdf_extractor.extract_content())
-            # self.logger.debug(f"Extracted text length: {len(self.text_content)}")
-
-            # self.logger.debug("Extracting table content...")
-            self.table_content = self.pdf_extractor.extract_tables()
-            self.image_content = self.pdf_extractor.extract_images()
-            # self.logger.debug(f"Extracted table length: {len(self.table_content)}")
-
+            self.load_document_state(self.extract_document(pdf_path))
+            self.build_retrieval_indexes()
         except Exception as e:
             self.logger.error(f"Error initializing service: {str(e)}")
             raise
 
-    def get_answers(self, questions: List[str]) -> List[Dict[str, Any]]:
-        """Get answers for multiple questions"""
+    def extract_document(self, pdf_path: str) -> Dict[str, Any]:
+        """Extract (or load from cache) the text, tables, image text and chunks of a PDF"""
+        with get_instrumentation().timer("extract_document"):
+            return self._extract_document(pdf_path)
+
+    def _extract_document(self, pdf_path: str) -> Dict[str, Any]:
+        instrumentation = get_instrumentation()
+        document_hash = ExtractionCache.file_hash(pdf_path)
+        cache_key = None
+        if self.cache:
+            cache_key = self.cache.make_key(pdf_path, self.extraction_settings(), document_hash)
+            cached = self.cache.get(cache_key)
+            if cached:
+                instrumentation.increment("extraction_cache_hits")
+                self.logger.debug(f"Using cached extraction for: {pdf_path}")
+                cached["document_hash"] = document_hash
+                return cached
+
+        self.logger.debug(f"Loading PDF from: {pdf_path}")
+        instrumentation.increment("documents_extracted")
+        self.pdf_extractor.load_pdf(pdf_path)
+        try:
+            if self.extraction_workers > 1:
+                extracted = self.pdf_extractor.extract_parallel(workers=self.extraction_workers)
+            else:
+                extracted = self.pdf_extractor.extract_all()
+        finally:
+            # Everything needed later is in the extracted state, so release the pdfplumber handle now
+            self.pdf_extractor.close()
+
+        # Page texts are normalized page by page and joined with single spaces, so the
+        # document map offsets match text_content
+        document_map = DocumentMap()
+        document_map.build(extracted["page_layouts"], extracted["page_texts"], self.text_processor.clean_text)
+        state = {
+            "document_hash": document_hash,
+            "text_content": extracted["text_content"],
+            "document_map": document_map.to_dict(),
+            "offset_map": extracted["offset_map"].to_dict(),
+            "table_content": extracted["table_content"],
+            "table_rows": extracted["table_rows"],
+            "image_content": extracted["image_content"]
+        }
+        # Token windows are tokenized once here and reused for every question
+        with instrumentation.timer("chunking"):
+            state["windows"] = {
+                context_type: self.qa_model.make_windows(state[key])
+                for key, context_type in (("table_content", "table"), ("image_content", "image"),
+                                          ("text_content", "text"))
+                if state[key]
+            }
+        state["chunks"] = {
+            context_type: [window["text"] for window in windows]
+            for context_type, windows in state["windows"].items()
+        }
+
+        if self.cache:
+            self.cache.put(cache_key, state)
+        return state
+
+    def extraction_settings(self) -> Dict[str, Any]:
+        """Everything that changes the extracted state: extractor settings plus the tokenizer and window size"""
+        return {
+            **self.pdf_extractor.settings(),
+            "tokenizer": self.qa_model.model_name,
+            "max_length": self.qa_model.max_length,
+            "stride": self.qa_model.stride
+        }
+
+    def view(self, window_scorer: Optional[Callable[[List[str], List[Dict[str, Any]]], List[Dict[str, Any]]]] = None
+             ) -> "QAService":
+        """Shallow copy sharing models, caches, settings and statistics but with its own current
+        document, so several threads can answer against different documents at once
+        """
+        service = copy.copy(self)
+        service.window_scorer = window_scorer
+        return service
+
+    def prepare_document_state(self, state: Dict[str, Any]) -> None:
+        """Attach the objects answering needs to an extracted state: window keys, the context
+        encoding cache, table store, document map with its section index and offset map.
+        Idempotent, so a registry can call it before measuring the state.
+        """
+        # Windows are keyed by position so cached encodings never outlive or mix up their windows
+        for context_type, windows in state.get("windows", {}).items():
+            for index, window in enumerate(windows):
+                window["key"] = f"{context_type}:{index}"
+        if "context_cache" not in state:
+            state["context_cache"] = ContextEncodingCache(self.context_cache_bytes)
+        if "table_store" not in state:
+            state["table_store"] = TableStore()
+            state["table_store"].build(state["table_rows"])
+        if not isinstance(state.get("document_map"), DocumentMap):
+            state["document_map"] = DocumentMap.from_dict(state.get("document_map") or {})
+            state["document_map"].build_index(state["text_content"])
+        if not isinstance(state.get("offset_map"), OffsetMap):
+            state["offset_map"] = OffsetMap.from_dict(state.get("offset_map") or {})
+
+    def load_document_state(self, state: Dict[str, Any]) -> None:
+        """Make an extracted document the current one"""
+        self.prepare_document_state(state)
+        self.text_content = state["text_content"]
+        self.table_content = state["table_content"]
+        self.parsed_tables = state["table_rows"]
+        self.image_content = state["image_content"]
+        self.chunks = state["chunks"]
+        self.document_hash = state.get("document_hash") or hashlib.sha256(self.text_content.encode()).hexdigest()
+        self.window_lookup = {
+            window["text"]: window for windows in state.get("windows", {}).values() for window in windows
+        }
+        self.context_cache = state["context_cache"]
+        self.table_store = state["table_store"]
+        self.document_map = state["document_map"]
+        self.offset_map = state["offset_map"]
+        if "indexes" in state:
+            self.retrieval_indexes = state["indexes"]
+
+    def build_retrieval_indexes(self) -> None:
+        """Build one BM25 index per context source so questions only read the top_k chunks"""
+        self.retrieval_indexes = self.build_indexes(self.chunks)
+
+    def build_indexes(self, chunks: Dict[str, List[str]]) -> Dict[str, BM25Index]:
+        """Build a BM25 index per context_type, or none when retrieval is disabled"""
+        indexes = {}
+        if self.top_k is None:
+            return indexes
+
+        for context_type, context_chunks in chunks.items():
+            index = BM25Index()
+            index.build(context_chunks)
+            indexes[context_type] = index
+        return indexes
+
+    def get_answers(self, questions: List[str], confidence_threshold: float = 0.5) -> List[Dict[str, Any]]:
+        """Get answers for multiple questions using batched inference"""
+        instrumentation = get_instrumentation()
+        instrumentation.increment("questions", len(questions))
+        with instrumentation.timer("get_answers"):
+            return self._get_answers(questions, confidence_threshold)
+
+    def _get_answers(self, questions: List[str], confidence_threshold: float) -> List[Dict[str, Any]]:
+        instrumentation = get_instrumentation()
         self.logger.debug(f"Processing {len(questions)} questions")
-        answers = []
-        for question in questions:
-            answer = self.find_answer(question)
-            answers.append({
-                "question": question,
-                "answer": answer["answer"],
-                "confidence": answer["confidence"],
-                "context_type": answer["context_type"]
+        results: Dict[int, Dict[str, Any]] = {}
+        pending = []
+        for index, question in enumerate(questions):
+            memoized = self._get_memoized(question, confidence_threshold)
+            fact = None if memoized else self.table_store.lookup(question)
+            if memoized:
+                instrumentation.increment("answers_memoized")
+                results[index] = memoized
+            elif fact and fact.confidence >= confidence_threshold:
+                instrumentation.increment("answers_from_table_store")
+                results[index] = self._fact_answer(fact)
+            else:
+                pending.append(index)
+        computed = list(pending)
+
+        if pending:
+            cascade_results = self.run_cascade([questions[i] for i in pending], confidence_threshold)
+            for index, answer in zip(pending, cascade_results):
+                results[index] = answer
+
+        for index in computed:
+            self._memoize(questions[index], results[index])
+
+        return [self._format_answer(question, results[index]) for index, question in enumerate(questions)]
+
+    def _fact_answer(self, fact: TableFact) -> Dict[str, Any]:
+        """Answer resolved directly from the table store, without a model call"""
+        return {
+            "answer": f"{fact.raw_value} {fact.unit}" if fact.unit and fact.unit != "%" else fact.raw_value,
+            "confidence": fact.confidence,
+            "context_type": "table",
+            "is_found": True
+        }
+
+    def _format_answer(self, question: str, answer: Dict[str, Any]) -> Dict[str, Any]:
+        formatted = {
+            "question": question,
+            "answer": answer["answer"],
+            "confidence": answer["confidence"],
+            "context_type": answer["context_type"]
+        }
+        if "page" in answer:
+            formatted["page"] = answer["page"]
+        if "section" in answer:
+            formatted["section"] = answer["section"]
+        if "source_offset" in answer:
+            formatted["source_offset"] = answer["source_offset"]
+        return formatted
+
+    def stream_answers(self, pdf_path: str, questions: List[str], confidence_threshold: float = 0.5,
+                       stop_early: bool = True, pipelined: bool = False,
+                       queue_size: int = 4) -> Iterator[Dict[str, Any]]:
+        """Answer questions page by page while the PDF is still being extracted.
+
+        With stop_early an answer is yielded as soon as it passes confidence_threshold,
+        the question is no longer evaluated, and extraction stops once every question
+        is answered. Otherwise all pages are read and the best answers are yielded at the
+        end. Questions with no answer above the threshold get "No answer found".
+
+        pipelined runs page parse, table detection, OCR and chunking in their own threads,
+        at most queue_size pages apart, so they overlap with model inference here. Pages
+        that are already chunked when the model is free are scored in the same batch.
+        """
+        self.pdf_extractor.load_pdf(pdf_path)
+
+        pipeline = None
+        if pipelined:
+            pipeline = Pipeline(self.pdf_extractor.pipeline_stages() + [("chunk", self._chunk_page)], queue_size)
+            pages = iter(pipeline.start(self.pdf_extractor.pdf.pages))
+        else:
+            pages = (self._chunk_page(page) for page in self.pdf_extractor.visit_pages(self.pdf_extractor.pdf.pages))
+
+        best: Dict[int, Dict[str, Any]] = {}
+        pending = list(range(len(questions)))
+        try:
+            for page_group in self._page_groups(pages, pipeline, len(pending)):
+                pair_owner, pair_questions, pair_windows, pair_types, pair_pages = [], [], [], [], []
+                for page, page_windows in page_group:
+                    for window, context_type in page_windows:
+                        for index in pending:
+                            pair_owner.append(index)
+                            pair_questions.append(questions[index])
+                            pair_windows.append(window)
+                            pair_types.append(context_type)
+                            pair_pages.append(page["page_number"])
+
+                results = self.run_qa_batch(pair_questions, [window["text"] for window in pair_windows],
+                                            pair_windows)
+                for owner, context_type, page_number, result in zip(pair_owner, pair_types, pair_pages, results):
+                    if result["answer"] and result["score"] > best.get(owner, {}).get("confidence", 0):
+                        best[owner] = {
+                            "answer": result["answer"],
+                            "confidence": result["score"],
+                            "context_type": context_type,
+                            "page": page_number,
+                            "is_found": result["score"] >= confidence_threshold
+                        }
+
+                if not stop_early:
+                    continue
+
+                answered = [index for index in pending if best.get(index, {}).get("is_found")]
+                for index in answered:
+                    yield self._format_answer(questions[index], best[index])
+                pending = [index for index in pending if index not in answered]
+
+                if not pending:
+                    self.logger.debug(f"All questions answered by page {page_group[-1][0]['page_number']}")
+                    break
+        finally:
+            if pipeline:
+                pipeline.stop()
+            self.pdf_extractor.close()
+
+        for index in pending:
+            answer = best.get(index)
+            # A best span below the threshold is not an answer, as in get_answers
+            if not answer or not answer["is_found"]:
+                answer = {
+                    "answer": "No answer found",
+                    "confidence": 0.0,
+                    "context_type": answer["context_type"] if answer else "",
+                    "is_found": False
+                }
+            yield self._format_answer(questions[index], answer)
+
+    def _page_groups(self, pages: Iterator[tuple], pipeline: Optional[Pipeline],
+                     question_count: int) -> Iterator[List[tuple]]:
+        """Chunked pages to score together: the next page, plus pages the pipeline has already
+        finished while they still fit in one model batch"""
+        for page in pages:
+            group = [page]
+            pairs = len(page[1]) * question_count
+            while pipeline and pairs < self.batch_size:
+                ready = pipeline.ready()
+                if ready is None:
+                    break
+                group.append(ready)
+                pairs += len(ready[1]) * question_count
+            yield group
+
+    def _chunk_page(self, page: Dict[str, Any]) -> tuple:
+        """(page, its (window, context_type) pairs), the chunking/tokenization step of page streaming"""
+        with get_instrumentation().timer("chunking"):
+            return page, self._page_windows(page)
+
+    def _page_windows(self, page: Dict[str, Any]) -> List[tuple]:
+        """(window, context_type) pairs for a single extracted page"""
+        sources = (
+            (self.pdf_extractor.table_processor.format_table_data(page["table_rows"]), "table"),
+            ("\n".join(page["image_texts"]), "image"),
+            (self.text_processor.clean_text(page["text"]), "text")
+        )
+        return [
+            (window, context_type)
+            for content, context_type in sources if content
+            for window in self.qa_model.make_windows(content) if window["text"].strip()
+        ]
+
+    def run_qa_batch(self, questions: List[str], contexts: List[str],
+                     windows: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Run the QA model over (question, context) pairs in padded batches.
+
+        Contexts that are known token windows skip tokenization and go straight to
+        the model, or to window_scorer when one is set; anything else goes through the
+        transformers pipeline.
+        """
+        context_cache = None
+        if windows is None:
+            windows = [self.window_lookup.get(context) for context in contexts]
+            context_cache = self.context_cache
+        if questions and all(window is not None for window in windows):
+            try:
+                if self.window_scorer is not None:
+                    return self.window_scorer(questions, windows)
+                return self.qa_model.score_windows(questions, windows, self.batch_size, context_cache)
+            except Exception as e:
+                self.logger.error(f"Error scoring windows, falling back to the pipeline: {str(e)}")
+
+        results = []
+        for start in range(0, len(questions), self.batch_size):
+            batch_questions = questions[start:start + self.batch_size]
+            batch_contexts = contexts[start:start + self.batch_size]
+            try:
+                instrumentation = get_instrumentation()
+                instrumentation.observe("batch_size", len(batch_questions))
+                with instrumentation.timer("pipeline_forward"):
+                    outputs = self.qa_pipeline(
+                        question=batch_questions,
+                        context=batch_contexts,
+                        batch_size=self.batch_size
+                    )
+                # The pipeline unwraps single-item inputs into a plain dict
+                if isinstance(outputs, dict):
+                    outputs = [outputs]
+                results.extend(outputs)
+            except Exception as e:
+                self.logger.error(f"Error processing batch: {str(e)}")
+                results.extend({"answer": "", "score": 0.0} for _ in batch_questions)
+        return results
+
+    def find_best_answers_batched(self, questions: List[str], context: str, context_type: str = "",
+                                  confidence_threshold: float = 0.5, max_chunks: Optional[int] = None,
+                                  max_ms: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Batched equivalent of find_best_answer_or_related_matches for several questions.
+
+        max_chunks limits the chunks read per question; max_ms stops scoring further
+        batches once the stage has used that much time.
+        """
+        if not context:
+            self.logger.warning("No content available for processing")
+            return [self._no_content_answer(context_type) for _ in questions]
+
+        try:
+            pair_owner, pair_questions, pair_contexts = self._candidate_pairs(questions, context, context_type,
+                                                                              max_chunks)
+            all_answers = [[] for _ in questions]
+            scored = self._score_pairs(pair_owner, pair_questions, pair_contexts, confidence_threshold, max_ms)
+            for owner, chunk, result in zip(pair_owner, pair_contexts, scored):
+                all_answers[owner].append((result["answer"], result["score"], chunk, result.get("start", 0)))
+
+            return [self._select_answer(answers, context_type, confidence_threshold) for answers in all_answers]
+
+        except Exception as e:
+            self.logger.error(f"Error in batched get_answer: {str(e)}")
+            return [self._error_answer(context_type) for _ in questions]
+
+    def _candidate_pairs(self, questions: List[str], context: str, context_type: str,
+                         max_chunks: Optional[int] = None) -> tuple:
+        """Every (question, chunk) pair to score, with the index of the question it belongs to"""
+        pair_owner, pair_questions, pair_contexts = [], [], []
+        for index, question in enumerate(questions):
+            for chunk in self._get_chunks(question, context, context_type, max_chunks):
+                pair_owner.append(index)
+                pair_questions.append(question)
+                pair_contexts.append(chunk)
+        return pair_owner, pair_questions, pair_contexts
+
+    def _score_pairs(self, groups: List[Any], questions: List[str], contexts: List[str],
+                     confidence_threshold: float, max_ms: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Score (question, chunk) pairs with the reader tiers.
+
+        The first tier scores every pair. A group of pairs (one question's chunks) whose best
+        score is below the tier's escalate_below sends its escalate_chunks best pairs to the
+        next tier. Scores from different models are not comparable, so once the next tier has
+        read a group, the group's other pairs are cleared and its answer comes from that tier
+        alone. max_ms only limits the first tier.
+        """
+        if len(self.reader_tiers) == 1:
+            return self._run_with_budget(questions, contexts, max_ms)
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(questions)
+        members: Dict[Any, List[int]] = {}
+        for index, group in enumerate(groups):
+            members.setdefault(group, []).append(index)
+        candidates = list(range(len(questions)))
+        last = len(self.reader_tiers) - 1
+        for level, tier in enumerate(self.reader_tiers):
+            if not candidates:
+                break
+            start = time.perf_counter()
+            try:
+                with get_instrumentation().timer(f"reader_tier_{level}"):
+                    scored = self._run_with_budget([questions[i] for i in candidates],
+                                                   [contexts[i] for i in candidates],
+                                                   max_ms if level == 0 else None, self.reader_models[level])
+            except Exception as e:
+                # The next tier reads the same candidates instead
+                self.logger.error(f"Error in reader {tier['model_name']}: {str(e)}")
+                continue
+            for index, result in zip(candidates, scored):
+                results[index] = result
+
+            by_group: Dict[Any, List[int]] = {}
+            for index in candidates[:len(scored)]:
+                by_group.setdefault(groups[index], []).append(index)
+            if level > 0:
+                for group, indices in by_group.items():
+                    for index in set(members[group]) - set(indices):
+                        results[index] = None
+            threshold = confidence_threshold if level == last else tier.get("escalate_below", confidence_threshold)
+            escalate, confident = [], 0
+            for indices in by_group.values():
+                if max(results[index]["score"] for index in indices) >= threshold:
+                    confident += 1
+                elif level < last:
+                    ranked = sorted(indices, key=lambda index: results[index]["score"], reverse=True)
+                    escalate.extend(ranked[:tier.get("escalate_chunks", 2)])
+            self._record_tier(level, len(by_group), confident, len(scored), time.perf_counter() - start)
+            candidates = sorted(escalate)
+        return [result or {"answer": "", "score": 0.0} for result in results]
+
+    def _record_tier(self, level: int, groups: int, confident: int, pairs: int, seconds: float) -> None:
+        stats = self.reader_stats[level]
+        stats["groups"] += groups
+        stats["confident"] += confident
+        if level < len(self.reader_tiers) - 1:
+            stats["escalated"] += groups - confident
+        stats["pairs"] += pairs
+        stats["seconds"] += seconds
+        instrumentation = get_instrumentation()
+        instrumentation.increment(f"reader_tier_{level}_questions", groups)
+        instrumentation.increment(f"reader_tier_{level}_confident", confident)
+
+    def reader_report(self) -> List[Dict[str, Any]]:
+        """Per reader tier: questions reaching it, share answered confidently, escalations and latency.
+
+        A question counts once per cascade stage it is read in.
+        """
+        report = []
+        for tier, stats in zip(self.reader_tiers, self.reader_stats):
+            groups = stats["groups"]
+            report.append({
+                "model_name": tier["model_name"],
+                "questions": groups,
+                "hit_rate": stats["confident"] / groups if groups else 0.0,
+                "escalated": stats["escalated"],
+                "pairs": stats["pairs"],
+                "seconds": stats["seconds"],
+                "ms_per_question": stats["seconds"] * 1000 / groups if groups else 0.0
             })
-        return answers
+        return report
+
+    def _run_reader(self, qa_model: QAModel, questions: List[str], contexts: List[str]) -> List[Dict[str, Any]]:
+        """Score pairs with one reader; readers other than the main model tokenize chunks themselves"""
+        if qa_model is self.qa_model:
+            return self.run_qa_batch(questions, contexts)
+
+        owners, pair_questions, pair_windows = [], [], []
+        for index, (question, context) in enumerate(zip(questions, contexts)):
+            # Chunks re-tokenized for this reader live in the document's bounded encoding cache
+            chunk_windows = self.context_cache.get(("tier_windows", qa_model.model_name), context,
+                                                   lambda: qa_model.make_windows(context))
+            for window in chunk_windows:
+                owners.append(index)
+                pair_questions.append(question)
+                pair_windows.append(window)
+
+        results = [{"answer": "", "score": 0.0, "start": 0} for _ in questions]
+        for index, window, result in zip(owners, pair_windows,
+                                         qa_model.score_windows(pair_questions, pair_windows, self.batch_size)):
+            if result["answer"] and result["score"] > results[index]["score"]:
+                # Answer offsets are relative to the window; callers expect them relative to the chunk
+                results[index] = {**result, "start": result["start"] + window["start"]}
+        return results
+
+    def _run_with_budget(self, questions: List[str], contexts: List[str], max_ms: Optional[float] = None,
+                         qa_model: Optional[QAModel] = None) -> List[Dict[str, Any]]:
+        """Score pairs one batch at a time, leaving the remaining pairs unscored once max_ms is spent"""
+        qa_model = qa_model or self.qa_model
+        if max_ms is None:
+            return self._run_reader(qa_model, questions, contexts)
+
+        results = []
+        start = time.perf_counter()
+        for batch_start in range(0, len(questions), self.batch_size):
+            if (time.perf_counter() - start) * 1000 >= max_ms:
+                get_instrumentation().increment("cascade_budget_exhausted")
+                self.logger.debug(f"Stage budget of {max_ms}ms spent after {len(results)} of {len(questions)} pairs")
+                break
+            results.extend(self._run_reader(qa_model, questions[batch_start:batch_start + self.batch_size],
+                                            contexts[batch_start:batch_start + self.batch_size]))
+        return results
+
+    def _contents(self) -> Dict[str, str]:
+        return {"table": self.table_content, "image": self.image_content, "text": self.text_content}
+
+    def _stage_chunk_limit(self, stage: Dict[str, Any]) -> int:
+        limit = stage.get("max_chunks") or self.top_k
+        return limit or len(self.chunks.get(stage["context_type"], [])) or 1
+
+    def _stage_cost(self, stage: Dict[str, Any]) -> float:
+        """Expected model tokens per question: windows read times their average length"""
+        context_type = stage["context_type"]
+        windows = [self.window_lookup[chunk] for chunk in self.chunks.get(context_type, [])
+                   if chunk in self.window_lookup]
+        if windows:
+            average_tokens = sum(len(window["input_ids"]) for window in windows) / len(windows)
+            return min(len(windows), self._stage_chunk_limit(stage)) * average_tokens
+        # Roughly four characters per token when the source has no token windows
+        return min(len(self._contents()[context_type]) / 4, self._stage_chunk_limit(stage) * self.qa_model.max_length)
+
+    def _stage_yield(self, stage: Dict[str, Any], prior_weight: int = 20) -> float:
+        """Share of questions the stage answers: the configured prior, updated with observed hits"""
+        stats = self.cascade_stats.get(stage["context_type"], {"attempts": 0, "answered": 0})
+        prior = stage.get("expected_yield", 0.5)
+        return max((stats["answered"] + prior * prior_weight) / (stats["attempts"] + prior_weight), 0.01)
+
+    def cascade_order(self) -> List[Dict[str, Any]]:
+        """Cascade stages with content, cheapest per expected answer first"""
+        contents = self._contents()
+        stages = [stage for stage in self.cascade if contents.get(stage["context_type"])]
+        return sorted(stages, key=lambda stage: self._stage_cost(stage) / self._stage_yield(stage))
+
+    def _joint_pass_cheaper(self, stages: List[Dict[str, Any]], question_count: int) -> bool:
+        """Whether scoring every stage in one pass is expected to cost fewer model tokens than
+        running the stages in order, where a question stops at its first confident stage.
+
+        Each model pass also costs pass_overhead_tokens, so a joint pass only wins when the
+        stages are small next to that overhead or rarely answer anything.
+        """
+        sequential, reach = 0.0, 1.0  # reach: expected share of questions getting to the stage
+        for stage in stages:
+            sequential += reach * (question_count * self._stage_cost(stage) + self.pass_overhead_tokens)
+            reach *= 1 - self._stage_yield(stage)
+        joint = question_count * sum(self._stage_cost(stage) for stage in stages) + self.pass_overhead_tokens
+        return joint < sequential
+
+    def run_cascade(self, questions: List[str], confidence_threshold: float = 0.5) -> List[Dict[str, Any]]:
+        """Answer questions from the cascade stages, each question stopping at the first confident stage.
+
+        When all candidate chunks fit in a single model batch, no stage has a time budget and
+        one joint pass is expected to read fewer tokens than the early-exit order, all of them
+        are scored in that one pass and the stage order is applied to the results instead.
+        """
+        stages = self.cascade_order()
+        if not stages:
+            return [self._no_content_answer("") for _ in questions]
+
+        contents = self._contents()
+        # Each stage reads at most its chunk limit per question, so this bounds the joint batch
+        max_pairs = len(questions) * sum(self._stage_chunk_limit(stage) for stage in stages)
+        if (len(stages) > 1 and max_pairs <= self.batch_size and not any(stage.get("max_ms") for stage in stages)
+                and self._joint_pass_cheaper(stages, len(questions))):
+            stage_pairs = [
+                self._candidate_pairs(questions, contents[stage["context_type"]], stage["context_type"],
+                                      self._stage_chunk_limit(stage))
+                for stage in stages
+            ]
+            return self._run_cascade_jointly(questions, stages, stage_pairs, confidence_threshold)
+
+        results: Dict[int, Dict[str, Any]] = {}
+        pending = list(range(len(questions)))
+        for stage in stages:
+            if not pending:
+                break
+            context_type = stage["context_type"]
+            stage_results = self.find_best_answers_batched(
+                [questions[i] for i in pending], contents[context_type], context_type, confidence_threshold,
+                self._stage_chunk_limit(stage), stage.get("max_ms")
+            )
+            for index, answer in zip(pending, stage_results):
+                results[index] = answer
+            self._record_stage(context_type, stage_results)
+            pending = [index for index in pending if not results[index]["is_found"]]
+        return [results[index] for index in range(len(questions))]
+
+    def _run_cascade_jointly(self, questions: List[str], stages: List[Dict[str, Any]], stage_pairs: List[tuple],
+                             confidence_threshold: float) -> List[Dict[str, Any]]:
+        get_instrumentation().increment("cascade_joint_passes")
+        # Pairs are grouped by (stage, question) so each stage's answer escalates on its own
+        pair_groups = [(stage_index, owner) for stage_index, pairs in enumerate(stage_pairs) for owner in pairs[0]]
+        pair_questions = [question for pairs in stage_pairs for question in pairs[1]]
+        pair_contexts = [context for pairs in stage_pairs for context in pairs[2]]
+        scored = iter(self._score_pairs(pair_groups, pair_questions, pair_contexts, confidence_threshold))
+
+        results: Dict[int, Dict[str, Any]] = {}
+        for stage, (pair_owner, _, contexts) in zip(stages, stage_pairs):
+            all_answers = [[] for _ in questions]
+            for owner, chunk in zip(pair_owner, contexts):
+                result = next(scored)
+                all_answers[owner].append((result["answer"], result["score"], chunk, result.get("start", 0)))
+
+            pending = [index for index in range(len(questions)) if not results.get(index, {}).get("is_found")]
+            stage_results = [self._select_answer(all_answers[index], stage["context_type"], confidence_threshold)
+                             for index in pending]
+            for index, answer in zip(pending, stage_results):
+                results[index] = answer
+            self._record_stage(stage["context_type"], stage_results)
+        return [results[index] for index in range(len(questions))]
+
+    def _record_stage(self, context_type: str, stage_results: List[Dict[str, Any]]) -> None:
+        stats = self.cascade_stats.setdefault(context_type, {"attempts": 0, "answered": 0})
+        answered = sum(1 for answer in stage_results if answer["is_found"])
+        stats["attempts"] += len(stage_results)
+        stats["answered"] += answered
+        get_instrumentation().increment(f"cascade_{context_type}_answered", answered)
 
     def find_exact_match(self, question: str, content: str) -> str | None:
         """Search for an exact match of the question in the text"""
@@ -78,18 +754,48 @@ class QAService:
                 return line
         return None
 
+    def answer_cache_config(self, confidence_threshold: float) -> Dict[str, Any]:
+        """Settings that change answers, including extraction settings; all are part of the memoization key"""
+        return {
+            "extraction": self.extraction_settings(),
+            "model_name": self.qa_model.model_name,
+            "backend": self.qa_model.backend,
+            "confidence_threshold": confidence_threshold,
+            "top_k": self.top_k,
+            "reader_mode": self.reader_mode,
+            "rerank_k": self.rerank_k,
+            "cascade": self.cascade,
+            "route_sections": self.route_sections,
+            "reader_tiers": self.reader_tiers
+        }
+
+    def _get_memoized(self, question: str, confidence_threshold: float) -> Optional[Dict[str, Any]]:
+        if not self.answer_cache:
+            return None
+        self.answer_cache.set_config(self.answer_cache_config(confidence_threshold))
+        return self.answer_cache.get(self.document_hash, question)
+
+    def _memoize(self, question: str, answer: Dict[str, Any]) -> None:
+        # Errors are transient, so they are never memoized
+        if self.answer_cache and answer["answer"] != "Error processing question":
+            self.answer_cache.put(self.document_hash, question, answer)
+
     def find_answer(self, question, confidence_threshold: float = 0.5):
-        answer = self.find_best_answer_or_related_matches(question, self.table_content, "table")
-        if not answer["is_found"]:
-            answer = self.find_best_answer_or_related_matches(question, self.image_content, "image")
-        elif not answer["is_found"]:
-            answer = self.find_best_answer_or_related_matches(question, self.text_content, "text")
-        # return answer
-        # answer = self.find_best_answer_or_related_matches(question, self.text_content, "text")
-        # answer = self.find_best_answer_or_related_matches(question, self.image_content, "image")
-        # answer = self.find_best_answer_or_related_matches(question, self.table_content, "table")
+        memoized = self._get_memoized(question, confidence_threshold)
+        if memoized:
+            return memoized
+
+        answer = self._find_answer(question, confidence_threshold)
+        self._memoize(question, answer)
         return answer
 
+    def _find_answer(self, question, confidence_threshold: float = 0.5):
+        fact = self.table_store.lookup(question)
+        if fact and fact.confidence >= confidence_threshold:
+            return self._fact_answer(fact)
+
+        return self.run_cascade([question], confidence_threshold)[0]
+
 
 
     def find_best_answer_or_related_matches(self, question: str, context: str, context_type: str = "",
@@ -100,78 +806,144 @@ class QAService:
 
             if not context:
                 self.logger.warning("No content available for processing")
-                return {
-                    "answer": "No content loaded",
-                    "confidence": 0.0,
-                    "context_type": context_type,
-                    "is_found": False
-                }
-
-            content = context
-            exact_match = self.find_exact_match(question, content)
-            if exact_match:
-                content = exact_match  # Use the content with the exact match
+                return self._no_content_answer(context_type)
 
-            chunks = self.text_processor.split_into_chunks(content)
-            best_answer = None
-            best_score = 0
             all_answers = []
-
-            for chunk in chunks:
-                if not chunk.strip():  # Skip empty chunks
-                    continue
+            for chunk in self._get_chunks(question, context, context_type):
                 try:
                     result = self.qa_pipeline(question=question, context=chunk)
-                    # result = self.qa_model.get_answer(question, chunk)
-                    # print(f"Chunk: {chunk[:200]}...")  # Print the first 200 characters of the chunk
-                    # print(f"Answer: {result['answer']}, Score: {result['score']}")  # Print the answer and score
-                    all_answers.append((result["answer"], result["score"], chunk))
-
-                    if result["score"] > best_score:
-                        best_answer = result["answer"]
-                        best_score = result["score"]
-
+                    all_answers.append((result["answer"], result["score"], chunk, result.get("start", 0)))
                 except Exception as e:
-                    print(f"Error processing chunk: {e}")
+                    self.logger.error(f"Error processing chunk: {e}")
 
-            # If a confident answer is found, return it
-            if best_answer and best_score >= confidence_threshold:
-                return {
-                    "answer": best_answer,
-                    "confidence": best_score,
-                    "context_type": context_type,
-                    "is_found": True
-
-                }
-            else:
-                # If no confident answer is found, return the top 5 related answers
-                sorted_answers = sorted(all_answers, key=lambda x: x[1], reverse=True)
-                # top_matches = [answer for answer, score, chunk in sorted_answers if score >= confidence_threshold]
-                top_matches = [
-                    {"answer": answer, "confidence": score, "chunk": chunk}
-                    for answer, score, chunk in sorted_answers
-                    if score >= confidence_threshold
-                ]
-                if len(top_matches) > 0:
-                    return top_matches[0]
-                else:
-                    return {
-                        "answer": "No answer found",
-                        "confidence": 0.0,
-                        "context_type": context_type,
-                        "is_found": False
-                    }
+            return self._select_answer(all_answers, context_type, confidence_threshold)
 
         except Exception as e:
             self.logger.error(f"Error in get_answer: {str(e)}")
+            return self._error_answer(context_type)
+
+    def _get_chunks(self, question: str, context: str, context_type: str = "",
+                    max_chunks: Optional[int] = None) -> List[str]:
+        """Narrow the context to an exact match or the top_k retrieved chunks, at most max_chunks of them"""
+        content = context
+        exact_match = self.find_exact_match(question, content)
+        if exact_match:
+            content = exact_match  # Use the content with the exact match
+        elif context_type in self.retrieval_indexes:
+            top_k = min(self.top_k, max_chunks) if max_chunks else self.top_k
+            index = self.retrieval_indexes[context_type]
+            routed = self._routed_chunk_ids(question, context_type)
+            chunks = index.top_chunks(question, top_k, routed) if routed else []
+            chunks = chunks or index.top_chunks(question, top_k)
+            return self._rerank([chunk for chunk in chunks if chunk.strip()], question)
+        elif context_type in self.chunks:
+            routed = self._routed_chunk_ids(question, context_type)
+            chunks = [chunk for chunk_id, chunk in enumerate(self.chunks[context_type])
+                      if chunk.strip() and (not routed or chunk_id in routed)]
+            return chunks[:max_chunks]
+
+        return [chunk for chunk in self.text_processor.split_into_chunks(content) if chunk.strip()][:max_chunks]
+
+    def _routed_chunk_ids(self, question: str, context_type: str) -> Set[int]:
+        """Ids of the text chunks overlapping the sections the document map routes the question to"""
+        if context_type != "text" or not self.route_sections:
+            return set()
+        sections = self.document_map.route(question, self.route_sections)
+        if not sections:
+            return set()
+
+        routed = set()
+        for chunk_id, chunk in enumerate(self.chunks.get(context_type, [])):
+            window = self.window_lookup.get(chunk)
+            if not window or "start" not in window:
+                continue
+            start, end = window["start"], window["start"] + len(window["text"])
+            if any(start < section.end and end > section.start for section in sections):
+                routed.add(chunk_id)
+        get_instrumentation().observe("routed_chunks", len(routed))
+        return routed
+
+    def _locate(self, context_type: str, chunk: str, answer_start: int) -> Dict[str, Any]:
+        """Page, section and raw page text offset of an answer found in a text window"""
+        window = self.window_lookup.get(chunk)
+        if context_type != "text" or not window or "start" not in window or not self.document_map.page_offsets:
+            return {}
+        offset = window["start"] + answer_start
+        location = {"page": self.document_map.page_at(offset)}
+        if len(self.offset_map):
+            location["page"], location["source_offset"] = self.offset_map.locate(offset)
+        section = self.document_map.section_at(offset)
+        if section:
+            location["section"] = section.title
+        return location
+
+    def _rerank(self, chunks: List[str], question: str) -> List[str]:
+        """In late-interaction mode keep only the rerank_k chunks closest to the question"""
+        if self.reader_mode != "late_interaction" or len(chunks) <= self.rerank_k:
+            return chunks
+        windows = [self.window_lookup.get(chunk) for chunk in chunks]
+        if any(window is None for window in windows) or not self.qa_model.supports_late_interaction():
+            return chunks
+
+        scores = self.qa_model.late_interaction_scores(question, windows, self.context_cache, self.batch_size)
+        ranked = sorted(zip(scores, range(len(chunks))), reverse=True)[:self.rerank_k]
+        return [chunks[position] for _, position in sorted(ranked, key=lambda item: item[1])]
+
+    def _select_answer(self, all_answers: List[tuple], context_type: str, confidence_threshold: float):
+        """Pick the best (answer, score, chunk, answer start) candidate for a question"""
+        best_answer = None
+        best_score = 0
+        best_location = {}
+        for answer, score, chunk, start in all_answers:
+            if score > best_score:
+                best_answer = answer
+                best_score = score
+                best_location = (chunk, start)
+
+        # If a confident answer is found, return it
+        if best_answer and best_score >= confidence_threshold:
             return {
-                "answer": "Error processing question",
-                "confidence": 0.0,
+                "answer": best_answer,
+                "confidence": best_score,
                 "context_type": context_type,
-                "is_found": False
-
+                "is_found": True,
+                **self._locate(context_type, *best_location)
             }
 
+        # If no confident answer is found, return the top related answer
+        sorted_answers = sorted(all_answers, key=lambda x: x[1], reverse=True)
+        top_matches = [
+            {"answer": answer, "confidence": score, "chunk": chunk,
+             "context_type": context_type, "is_found": True}
+            for answer, score, chunk, _ in sorted_answers
+            if score >= confidence_threshold
+        ]
+        if len(top_matches) > 0:
+            return top_matches[0]
+
+        return {
+            "answer": "No answer found",
+            "confidence": 0.0,
+            "context_type": context_type,
+            "is_found": False
+        }
+
+    def _no_content_answer(self, context_type: str) -> Dict[str, Any]:
+        return {
+            "answer": "No content loaded",
+            "confidence": 0.0,
+            "context_type": context_type,
+            "is_found": False
+        }
+
+    def _error_answer(self, context_type: str) -> Dict[str, Any]:
+        return {
+            "answer": "Error processing question",
+            "confidence": 0.0,
+            "context_type": context_type,
+            "is_found": False
+        }
+
     def cleanup(self):
         """Clean up resources"""
         try:
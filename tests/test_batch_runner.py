@@ -0,0 +1,46 @@
+import json
+
+from src.services.batch_runner import Checkpoint
+
+
+def test_resume_reads_done_and_failed(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+    checkpoint = Checkpoint(path)
+    checkpoint.mark(["a", "b"])
+    checkpoint.mark(["c"], status="failed", error="boom")
+    checkpoint.close()
+
+    resumed = Checkpoint(path)
+    assert resumed.done == {"a", "b"}
+    assert resumed.failed == {"c": "boom"}
+    resumed.close()
+
+
+def test_retried_failure_counts_as_done(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+    checkpoint = Checkpoint(path)
+    checkpoint.mark(["a"], status="failed", error="timeout")
+    checkpoint.mark(["a"])
+    checkpoint.close()
+
+    resumed = Checkpoint(path)
+    assert resumed.done == {"a"}
+    assert resumed.failed == {}
+    resumed.close()
+
+
+def test_partially_written_last_line_is_skipped(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    complete = json.dumps({"document_id": "a", "status": "done", "time": 1.0})
+    path.write_text(complete + "\n" + '{"document_id": "b", "sta', encoding="utf-8")
+
+    resumed = Checkpoint(str(path))
+    assert resumed.done == {"a"}
+    assert resumed.failed == {}
+
+    # Entries written after resuming must survive the next resume
+    resumed.mark(["b"])
+    resumed.close()
+    again = Checkpoint(str(path))
+    assert again.done == {"a", "b"}
+    again.close()
@@ -0,0 +1,66 @@
+import json
+import os
+
+import numpy as np
+
+from src.core.corpus_index import CorpusIndex
+
+
+def _chunks(*texts):
+    return [{"text": text, "page": index + 1, "start": index * 100} for index, text in enumerate(texts)]
+
+
+def _interrupted_add(index_dir):
+    """Append a second document's bytes to every file without committing index.json, as a crash would"""
+    for name, data in (("vectors.f32", np.ones((2, 4), dtype=np.float32).tobytes()),
+                       ("meta.i64", np.ones((2, CorpusIndex.META_COLUMNS), dtype=np.int64).tobytes()),
+                       ("texts.bin", "half written".encode("utf-8")),
+                       ("documents.jsonl", (json.dumps("doc-b") + "\n").encode("utf-8"))):
+        with open(os.path.join(index_dir, name), "ab") as f:
+            f.write(data)
+
+
+def test_reopen_truncates_uncommitted_writes(tmp_path):
+    index = CorpusIndex(str(tmp_path))
+    index.add("doc-a", _chunks("net sales grew", "emissions fell"), np.eye(4, dtype=np.float32)[:2])
+    committed = {name: os.path.getsize(tmp_path / name) for name in ("vectors.f32", "meta.i64", "texts.bin")}
+    _interrupted_add(str(tmp_path))
+
+    reopened = CorpusIndex(str(tmp_path))
+
+    assert len(reopened) == 2
+    assert reopened.document_ids == ["doc-a"]
+    assert not reopened.has_document("doc-b")
+    for name, size in committed.items():
+        assert os.path.getsize(tmp_path / name) == size
+    hits = reopened.search(np.array([0, 1, 0, 0], dtype=np.float32), top_k=1)
+    assert hits[0]["text"] == "emissions fell"
+    assert hits[0]["document_id"] == "doc-a"
+    assert hits[0]["page"] == 2
+
+
+def test_add_after_recovery_appends_cleanly(tmp_path):
+    index = CorpusIndex(str(tmp_path))
+    index.add("doc-a", _chunks("net sales grew"), np.eye(4, dtype=np.float32)[:1])
+    _interrupted_add(str(tmp_path))
+
+    reopened = CorpusIndex(str(tmp_path))
+    reopened.add("doc-b", _chunks("dividend proposed"), np.eye(4, dtype=np.float32)[2:3])
+
+    assert len(reopened) == 2
+    assert reopened.document_ids == ["doc-a", "doc-b"]
+    hits = reopened.search(np.array([0, 0, 1, 0], dtype=np.float32), top_k=1)
+    assert hits[0]["text"] == "dividend proposed"
+    assert hits[0]["document_id"] == "doc-b"
+    assert len(CorpusIndex(str(tmp_path))) == 2
+
+
+def test_reopen_with_nothing_committed(tmp_path):
+    CorpusIndex(str(tmp_path))
+    _interrupted_add(str(tmp_path))
+
+    reopened = CorpusIndex(str(tmp_path))
+
+    assert len(reopened) == 0
+    assert reopened.document_ids == []
+    assert reopened.search(np.ones(4, dtype=np.float32)) == []
@@ -0,0 +1,92 @@
+import itertools
+import threading
+import time
+
+import pytest
+
+from src.core.pipeline import Pipeline
+
+
+def slow(seconds):
+    def stage(item):
+        time.sleep(seconds)
+        return item
+    return stage
+
+
+def test_items_come_out_in_input_order():
+    pipeline = Pipeline([("double", lambda item: item * 2), ("jitter", slow(0.001)), ("add", lambda item: item + 1)],
+                        queue_size=2)
+    assert list(pipeline.start(range(50))) == [item * 2 + 1 for item in range(50)]
+    pipeline.stop()
+
+
+def test_empty_source():
+    pipeline = Pipeline([("identity", lambda item: item)])
+    assert list(pipeline.start([])) == []
+    pipeline.stop()
+
+
+def test_stage_error_is_raised_in_the_consumer():
+    def parse(item):
+        if item == 3:
+            raise ValueError("bad page 3")
+        return item
+
+    pipeline = Pipeline([("parse", parse), ("identity", lambda item: item)])
+    received = []
+    with pytest.raises(ValueError, match="bad page 3"):
+        for item in pipeline.start(range(10)):
+            received.append(item)
+    pipeline.stop()
+    assert received == [0, 1, 2]
+
+
+def test_source_error_is_raised_in_the_consumer():
+    def source():
+        yield 1
+        raise OSError("pdf truncated")
+
+    pipeline = Pipeline([("identity", lambda item: item)])
+    with pytest.raises(OSError, match="pdf truncated"):
+        list(pipeline.start(source()))
+    pipeline.stop()
+
+
+def test_stop_ends_blocked_producers():
+    before = threading.active_count()
+    pipeline = Pipeline([("first", lambda item: item), ("second", lambda item: item)], queue_size=1)
+    items = iter(pipeline.start(itertools.count()))
+    assert next(items) == 0
+    time.sleep(0.05)  # Let every queue fill so each thread is blocked on a put
+
+    start = time.perf_counter()
+    pipeline.stop(timeout=2.0)
+
+    assert time.perf_counter() - start < 1.0
+    assert not any(thread.is_alive() for thread in pipeline._threads)
+    assert threading.active_count() == before
+
+
+def test_ready_never_blocks():
+    pipeline = Pipeline([("slow", slow(0.2))])
+    pipeline.start(range(3))
+
+    start = time.perf_counter()
+    assert pipeline.ready() is None
+    assert time.perf_counter() - start < 0.05
+
+    assert list(pipeline) == [0, 1, 2]
+    assert pipeline.ready() is None
+    pipeline.stop()
+
+
+def test_ready_returns_finished_items_then_iteration_continues():
+    pipeline = Pipeline([("identity", lambda item: item)])
+    pipeline.start(range(3))
+    time.sleep(0.05)
+
+    first = pipeline.ready()
+    assert first == 0
+    assert [first] + list(pipeline) == [0, 1, 2]
+    pipeline.stop()
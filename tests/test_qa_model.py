@@ -0,0 +1,68 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from src.benchmarks.extraction_qa import register_tiny_model  # noqa: E402
+from src.core.qa_model import QAModel  # noqa: E402
+
+CONTEXTS = [
+    "The board proposes a dividend of 2 per share. Net sales grew to 1234 in 2021.",
+    "Scope 1 CO2e emissions were 3456 tonnes and the number of employees was 250.",
+]
+QUESTIONS = ["what dividend does the board propose?", "how many number of employee", "what is company name?"]
+
+
+@pytest.fixture(scope="module")
+def qa_model(tmp_path_factory):
+    torch.manual_seed(0)
+    model_name = register_tiny_model(str(tmp_path_factory.mktemp("vocab")))
+    return QAModel(model_name=model_name, device="cpu")
+
+
+def test_score_windows_matches_pipeline(qa_model):
+    from transformers import pipeline
+
+    qa_pipeline = pipeline("question-answering", model=qa_model.model, tokenizer=qa_model.tokenizer, device=-1)
+    for context in CONTEXTS:
+        windows = qa_model.make_windows(context)
+        assert len(windows) == 1
+        for question in QUESTIONS:
+            ours = qa_model.score_windows([question], windows)[0]
+            theirs = qa_pipeline(question=question, context=context, max_answer_len=qa_model.max_answer_length)
+            assert ours["score"] == pytest.approx(theirs["score"], rel=1e-4)
+            assert ours["answer"] == theirs["answer"].strip()
+
+
+def test_null_position_keeps_its_probability_mass(qa_model):
+    windows = qa_model.make_windows(CONTEXTS[0])
+    context_length = len(windows[0]["input_ids"])
+    start_logits = torch.full((context_length + 4,), -5.0)
+    end_logits = torch.full((context_length + 4,), -5.0)
+    start_logits[0] = end_logits[0] = 10.0  # The model is sure there is no answer
+
+    best = qa_model._best_span(start_logits, end_logits, 3, context_length, windows[0])
+    assert best["score"] < 1e-6
+    without_null = qa_model._best_span(start_logits, end_logits, 3, context_length, windows[0], has_null=False)
+    assert without_null["score"] > 1000 * best["score"]
+
+
+def test_window_embeddings_batch_matches_single_windows(qa_model):
+    windows = [window for context in CONTEXTS for window in qa_model.make_windows(context)]
+    batched = qa_model._window_embeddings(windows)
+    for window, embeddings in zip(windows, batched):
+        assert torch.allclose(embeddings, qa_model._window_embeddings([window])[0], atol=1e-5)
+
+
+def test_late_interaction_encodes_missing_windows_once(qa_model):
+    from src.core.context_cache import ContextEncodingCache
+
+    windows = [window for context in CONTEXTS for window in qa_model.make_windows(context)]
+    for index, window in enumerate(windows):
+        window["key"] = f"text:{index}"
+    context_cache = ContextEncodingCache()
+
+    first = qa_model.late_interaction_scores(QUESTIONS[0], windows, context_cache, batch_size=1)
+    assert context_cache.stats()["misses"] == len(windows)
+    second = qa_model.late_interaction_scores(QUESTIONS[0], windows, context_cache)
+    assert context_cache.stats()["hits"] == len(windows)
+    assert second == pytest.approx(first, rel=1e-5)
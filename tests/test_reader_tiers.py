@@ -0,0 +1,104 @@
+import time
+
+import pytest
+
+from src.services.qa_service import QAService
+
+TIERS = [
+    {"model_name": "small", "escalate_below": 0.5, "escalate_chunks": 1},
+    {"model_name": "large"},
+]
+
+
+@pytest.fixture
+def service():
+    return QAService(model_name="large", memoize=False, reader_tiers=TIERS, batch_size=2)
+
+
+def stub_readers(service, scores, calls, failing=(), delay=0.0):
+    """Score contexts from scores[model name][context]; record what each model read"""
+    def run_reader(qa_model, questions, contexts):
+        calls.setdefault(qa_model.model_name, []).extend(contexts)
+        if qa_model.model_name in failing:
+            raise RuntimeError("reader down")
+        time.sleep(delay)
+        return [{"answer": context, "score": scores[qa_model.model_name].get(context, 0.0)} for context in contexts]
+    service._run_reader = run_reader
+
+
+def test_confident_groups_stay_on_the_first_tier(service):
+    calls = {}
+    stub_readers(service, {"small": {"a1": 0.9, "a2": 0.2}, "large": {}}, calls)
+
+    results = service._score_pairs(["q", "q"], ["q", "q"], ["a1", "a2"], 0.5)
+
+    assert [result["score"] for result in results] == [0.9, 0.2]
+    assert "large" not in calls
+
+
+def test_unsure_group_escalates_its_best_chunks(service):
+    calls = {}
+    stub_readers(service, {"small": {"a1": 0.9, "b1": 0.3, "b2": 0.4, "b3": 0.1},
+                           "large": {"b2": 0.8}}, calls)
+
+    results = service._score_pairs(["a", "b", "b", "b"], ["qa", "qb", "qb", "qb"], ["a1", "b1", "b2", "b3"], 0.5)
+
+    assert calls["large"] == ["b2"]
+    assert results[0] == {"answer": "a1", "score": 0.9}
+    assert results[2] == {"answer": "b2", "score": 0.8}
+
+
+def test_escalated_group_keeps_only_the_later_tier_scores(service):
+    calls = {}
+    # The small reader's 0.45 is not comparable with the large reader's 0.2
+    stub_readers(service, {"small": {"c1": 0.46, "c2": 0.45}, "large": {"c1": 0.2}}, calls)
+
+    results = service._score_pairs(["q", "q"], ["q", "q"], ["c1", "c2"], 0.5)
+
+    assert results == [{"answer": "c1", "score": 0.2}, {"answer": "", "score": 0.0}]
+
+
+def test_failing_tier_falls_back_to_the_earlier_results(service):
+    calls = {}
+    stub_readers(service, {"small": {"c1": 0.46, "c2": 0.45}, "large": {}}, calls, failing=("large",))
+
+    results = service._score_pairs(["q", "q"], ["q", "q"], ["c1", "c2"], 0.5)
+
+    assert calls["large"] == ["c1"]
+    assert [result["score"] for result in results] == [0.46, 0.45]
+
+
+def test_failing_first_tier_is_read_by_the_next(service):
+    calls = {}
+    stub_readers(service, {"small": {}, "large": {"c1": 0.7, "c2": 0.1}}, calls, failing=("small",))
+
+    results = service._score_pairs(["q", "q"], ["q", "q"], ["c1", "c2"], 0.5)
+
+    assert calls["large"] == ["c1", "c2"]
+    assert [result["score"] for result in results] == [0.7, 0.1]
+
+
+def test_pairs_past_the_budget_are_left_unscored(service):
+    calls = {}
+    stub_readers(service, {"small": {"c1": 0.9, "c2": 0.9, "c3": 0.9, "c4": 0.9}, "large": {}}, calls, delay=0.02)
+
+    results = service._score_pairs(["a", "a", "b", "b"], ["q"] * 4, ["c1", "c2", "c3", "c4"], 0.5, max_ms=5)
+
+    # batch_size is 2: the first batch runs, then the 5ms budget is spent
+    assert calls["small"] == ["c1", "c2"]
+    assert results[2:] == [{"answer": "", "score": 0.0}, {"answer": "", "score": 0.0}]
+    assert "large" not in calls
+    assert service.reader_stats[0]["groups"] == 1
+
+
+def test_reader_report_counts(service):
+    calls = {}
+    stub_readers(service, {"small": {"a1": 0.9, "b1": 0.3, "c1": 0.2}, "large": {"b1": 0.7, "c1": 0.1}}, calls)
+
+    service._score_pairs(["a", "b", "c"], ["qa", "qb", "qc"], ["a1", "b1", "c1"], 0.5)
+    small, large = service.reader_report()
+
+    assert (small["model_name"], small["questions"], small["escalated"], small["pairs"]) == ("small", 3, 2, 3)
+    assert small["hit_rate"] == pytest.approx(1 / 3)
+    assert (large["model_name"], large["questions"], large["escalated"], large["pairs"]) == ("large", 2, 0, 2)
+    assert large["hit_rate"] == pytest.approx(0.5)
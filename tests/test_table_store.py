@@ -0,0 +1,76 @@
+import pytest
+
+from src.core.table_store import TableStore
+
+
+@pytest.fixture
+def store():
+    table_store = TableStore()
+    table_store.build([
+        {"Metric": "Net sales, SEK thousands", "2021": "1 234", "2022": "1 456,5"},
+        {"Metric": "Total", "2021": "900", "2022": "950"},
+        {"Metric": "Sales", "2021": "12", "2022": "14"},
+        {"Metric": "Scope 1 CO2e emissions, tonnes", "2021": "3 456", "2022": "3 210"},
+        {"Metric": "Operating margin, %", "2021": "8,5", "2022": "9,1"},
+        {"Metric": "Number of employees", "2021": "2,310", "2022": "2,480"},
+    ])
+    return table_store
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1 234", 1234.0),
+    ("1,234.5", 1234.5),
+    ("1.234.567", 1234567.0),
+    ("1.234.567,89", 1234567.89),
+    ("1,234,567", 1234567.0),
+    ("12,5", 12.5),
+    ("(340)", -340.0),
+    ("−12", -12.0),
+    ("4%", 4.0),
+    ("n/a", None),
+    ("", None),
+])
+def test_parse_number(text, expected):
+    assert TableStore().parse_number(text) == expected
+
+
+def test_split_unit_recognises_plural_and_percent_units():
+    table_store = TableStore()
+    assert table_store.split_unit("Net sales, SEK thousands") == ("Net sales", "SEK thousands")
+    assert table_store.split_unit("Scope 1 emissions, tonnes") == ("Scope 1 emissions", "tonnes")
+    assert table_store.split_unit("Operating margin, %") == ("Operating margin", "%")
+    assert table_store.split_unit("Profit, before tax") == ("Profit, before tax", None)
+
+
+def test_lookup_matches_metric_and_period(store):
+    fact = store.lookup("What were net sales in 2021?")
+    assert (fact.metric, fact.period, fact.value, fact.unit) == ("Net sales, SEK thousands", "2021", 1234.0,
+                                                                 "SEK thousands")
+    assert fact.confidence == 1.0
+
+
+def test_lookup_without_period_uses_latest(store):
+    fact = store.lookup("How many employees?")
+    assert (fact.period, fact.value) == ("2022", 2480.0)
+
+
+def test_lookup_long_metric_inside_longer_question(store):
+    fact = store.lookup("What is total Scope 1 CO2e emissions in 2021?")
+    assert fact.metric == "Scope 1 CO2e emissions, tonnes"
+    assert fact.value == 3456.0
+    assert 0 < fact.confidence < 1.0
+
+
+@pytest.mark.parametrize("question", [
+    "how many sales did we lose?",
+    "What is the total headcount growth target?",
+    "Which sales channels grew fastest in 2022?",
+])
+def test_one_word_metrics_do_not_match_unrelated_questions(store, question):
+    assert store.lookup(question) is None
+
+
+def test_lookup_unknown_period_or_metric(store):
+    assert store.lookup("What were net sales in 2019?") is None
+    assert store.lookup("What is the dividend policy?") is None
+    assert store.lookup("What is 2021?") is None
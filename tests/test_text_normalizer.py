@@ -0,0 +1,82 @@
+import pytest
+
+from src.core.processors.text_normalizer import OffsetMap, TextNormalizer
+
+PAGES = [
+    (1, "Revenue  was\t100 MSEK\n\nNet sales | grew"),
+    (2, "  Scope 1 • CO₂e emissions­: 3 456 tonnes...\n"),
+    (3, ""),
+    (4, "Dividend ﬁnal – (proposed)   2.50 SEK"),
+]
+
+
+@pytest.fixture
+def normalizer():
+    return TextNormalizer()
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("Revenue  was\t100", "Revenue was 100"),
+    ("  leading and trailing  \n", "leading and trailing"),
+    ("a | b • c", "a b c"),
+    ("CO₂e – 12.5", "CO2e - 12.5"),
+    ("ﬁnal “word”", 'final "word"'),
+    ("soft­hyphen", "softhyphen"),
+    ("Contents.......12", "Contents.12"),
+    ("Net margin (%) 4.5", "Net margin (%) 4.5"),
+    ("", ""),
+])
+def test_normalize(normalizer, raw, expected):
+    assert normalizer.normalize(raw)[0] == expected
+
+
+def test_options_change_output():
+    # Non-ASCII characters become separators rather than vanishing, so words never merge
+    text = "Omsättning | net sales (SEK) ... total"
+    normalizer = TextNormalizer(ascii_only=True, drop_words=["total"], collapse_dots=False)
+    assert normalizer.normalize(text)[0] == "Oms ttning net sales (SEK) ..."
+    assert normalizer.settings() != TextNormalizer().settings()
+
+
+def test_breakpoints_map_every_word_to_its_source(normalizer):
+    raw = "  Net sales |  CO₂e – 12.5 ... (SEK)"
+    text, normalized_points, source_points = normalizer.normalize(raw)
+    offset_map = OffsetMap()
+    offset_map.add_page(1, 0, normalized_points, source_points)
+
+    position = 0
+    for word in text.split(" "):
+        start = text.index(word, position)
+        page, source = offset_map.locate(start)
+        assert page == 1
+        assert normalizer.normalize(raw[source:])[0].startswith(word)
+        position = start + len(word)
+
+
+def test_locate_maps_document_offsets_to_raw_page_text(normalizer):
+    normalized = normalizer.normalize_pages(PAGES)
+    text, offset_map = normalized["text_content"], normalized["offset_map"]
+    raw_pages = dict(PAGES)
+
+    for needle, page, raw_word in [("Revenue", 1, "Revenue"), ("100", 1, "100"), ("grew", 1, "grew"),
+                                   ("Scope", 2, "Scope"), ("CO2e", 2, "CO₂e"), ("3 456", 2, "3 456"),
+                                   ("tonnes", 2, "tonnes"), ("final", 4, "ﬁnal"),
+                                   ("(proposed)", 4, "(proposed)"), ("2.50", 4, "2.50")]:
+        located_page, source = offset_map.locate(text.index(needle))
+        assert located_page == page, needle
+        assert raw_pages[page][source:source + len(raw_word)] == raw_word, needle
+
+
+def test_page_texts_join_into_document_text(normalizer):
+    normalized = normalizer.normalize_pages(PAGES)
+    assert normalized["text_content"] == " ".join(normalized["page_texts"])
+    assert normalized["page_texts"][2] == ""
+
+
+def test_offset_map_round_trip_and_unknown_offsets(normalizer):
+    offset_map = normalizer.normalize_pages(PAGES)["offset_map"]
+    restored = OffsetMap.from_dict(offset_map.to_dict())
+    assert len(restored) == len(offset_map)
+    assert [restored.locate(offset) for offset in range(80)] == [offset_map.locate(offset) for offset in range(80)]
+    assert OffsetMap().locate(10) == (0, 0)
+    assert offset_map.locate(-1) == (0, 0)